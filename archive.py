@@ -0,0 +1,164 @@
+## =======================================================
+## Program: Site Checker (archive) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+import gzip
+import json
+import threading
+from file_io import *
+
+
+def archive_path(output_name):
+    """
+    archive_path(output_name) returns the path of the HTTP archive recorded for output_name
+        today, on the user's desktop.
+
+    archive_path: Str -> Path
+
+    Example:
+        archive_path('mme_')
+        # Path('~/Desktop/mme_archive_{time_str}.jsonl.gz')
+    """
+    return user_desktop / f'{output_name}archive_{time_str}.jsonl.gz'
+
+
+class HttpArchive:
+    """
+    HttpArchive records every node page and link-check outcome of a scan into a gzip
+    compressed JSON-lines file, so the scan can later be re-analysed without the network.
+
+    Each line is one of:
+        {"node": url, "status": code}                 a node probe that was not 200
+        {"node": url, "status": code, "body": text}   a fetched node page
+        {"link": url, "broken": bool}                 a link-check outcome
+        {"link": url, "broken": true, "unreachable": true}
+                                                      a link whose host could not be reached
+
+    Page bodies are stored as latin-1 text so the original bytes round-trip exactly.
+    A resumed run appends a new gzip member, so it extends the archive of the run it
+    continues; any other run starts the archive afresh.
+    The record_* methods do nothing unless recording has been started.
+
+    Instance Attributes:
+        - file (GzipFile): The archive being written, or None when not recording.
+
+    HttpArchive: () -> HttpArchive
+
+    Example:
+        -> archive = HttpArchive()
+        -> archive.start(archive_path('mme_'))
+        -> archive.record_link('http://example.com/', False)
+        -> archive.stop()
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+
+    def start(self, path, resume=False):
+        """
+        start(path[, resume]) starts recording to the archive at path, appending to it if
+            resume is True and replacing it otherwise.
+
+        start: Path [Bool] -> None
+        """
+        with self.lock:
+            self.file = gzip.open(path, 'at' if resume else 'wt', encoding='utf-8')
+        print(f"Recording to {path}")
+
+    def stop(self):
+        """
+        stop() finishes and closes the archive being recorded, if any.
+
+        stop: () -> None
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def write(self, record):
+        """
+        write(record) appends record as one JSON line if recording.
+
+        write: Dict -> None
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def record_node(self, url, status, content=None):
+        """
+        record_node(url, status[, content]) records the status of a node and, if it was
+            fetched, its page body.
+
+        record_node: Str Int [Bytes] -> None
+        """
+        record = {'node': url, 'status': status}
+        if content is not None:
+            record['body'] = content.decode('latin-1')
+        self.write(record)
+
+    def record_link(self, url, broken, unreachable=False):
+        """
+        record_link(url, broken[, unreachable]) records the outcome of checking url.
+
+        record_link: Str Bool [Bool] -> None
+        """
+        record = {'link': url, 'broken': broken}
+        if unreachable:
+            record['unreachable'] = True
+        self.write(record)
+
+
+def read_archive(path):
+    """
+    read_archive(path) reads an archive written by HttpArchive.
+
+    read_archive: Path -> ((dictof Str Bool), (setof Str), (generator of (Str, Int, anyof(Bytes, None))))
+
+    Returns:
+        - links: URL -> True if it was broken, False if it was good.
+        - unreachable: URLs that failed because their host could not be reached.
+        - nodes: a generator yielding (url, status, content) for every recorded node in
+          recording order; content is None if the page was not fetched.
+
+    Effects:
+        - Reads the archive twice: once for the link outcomes, then lazily for the pages
+          through read_nodes, so only one page body is held in memory at a time.
+
+    Example:
+        links, unreachable, nodes = read_archive(archive_path('mme_'))
+        for url, status, content in nodes:
+            ...
+    """
+    links = {}
+    unreachable = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('{"link"'):
+                record = json.loads(line)
+                links[record['link']] = record['broken']
+                if record.get('unreachable'):
+                    unreachable.add(record['link'])
+    return links, unreachable, read_nodes(path)
+
+
+def read_nodes(path):
+    """
+    read_nodes(path) yields (url, status, content) for every node recorded in the archive
+        at path, in recording order; content is None if the page was not fetched.
+
+    read_nodes: Path -> (generator of (Str, Int, anyof(Bytes, None)))
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('{"node"'):
+                record = json.loads(line)
+                body = record.get('body')
+                yield record['node'], record['status'], body.encode('latin-1') if body is not None else None
@@ -0,0 +1,476 @@
+## =======================================================
+## Program: Site Checker (cache) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+from bitarray import bitarray
+from collections import OrderedDict
+from concurrent.futures import Future
+import gzip
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import re
+import threading
+
+
+LINK_CACHE_CAPACITY = 1000000
+LINK_CACHE_ERROR_RATE = 0.001
+ANALYSIS_CACHE_SIZE = 50000
+ANALYSIS_CACHE_PATH = Path('analysis_cache.json.gz')
+VOLATILE_PATTERNS = [
+    re.compile(rb'value="form-[\w-]+"'),
+    re.compile(rb'nonce="[^"]*"'),
+    re.compile(rb'"csrf_token":"[^"]*"'),
+]
+
+
+def page_hash(content):
+    """
+    page_hash(content) returns a digest of a page body that ignores the parts Drupal changes
+        on every request (form build ids, nonces, CSRF tokens) and whitespace, so the same page
+        hashes the same from one fetch to the next.
+
+    page_hash: Bytes -> Str
+
+    Example:
+        if page_hash(response.content) == previous_hash:
+            print("Page unchanged")
+    """
+    for pattern in VOLATILE_PATTERNS:
+        content = pattern.sub(b'', content)
+    return hashlib.sha256(b' '.join(content.split())).hexdigest()
+
+
+class BloomFilter:
+    """
+    BloomFilter is a fixed-size set of strings that answers membership queries with no
+    false negatives and a configurable false-positive rate.
+
+    Memory is fixed when the filter is created: about 1.8 MB for a million strings at a
+    0.1% error rate, however many strings are added. Past `capacity` strings the
+    false-positive rate slowly rises.
+
+    Instance Attributes:
+        - size (int): Number of bits in the filter.
+        - hashes (int): Number of bit positions set per string.
+        - bits (bitarray): The filter bits.
+
+    BloomFilter: [Int] [Float] -> BloomFilter
+
+    Example:
+        -> seen = BloomFilter(1000, 0.01)
+        -> seen.add('http://example.com/')
+        -> 'http://example.com/' in seen
+        True
+    """
+
+    def __init__(self, capacity=LINK_CACHE_CAPACITY, error_rate=LINK_CACHE_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bitarray(self.size)
+        self.bits.setall(0)
+
+    def positions(self, item):
+        """
+        positions(item) returns the bit positions of item, derived by double hashing one
+            128-bit digest.
+
+        positions: Str -> (listof int)
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """
+        add(item) adds item to the filter.
+
+        add: Str -> None
+        """
+        for position in self.positions(item):
+            self.bits[position] = 1
+
+    def __contains__(self, item):
+        return all(self.bits[position] for position in self.positions(item))
+
+
+class LinkCache:
+    """
+    LinkCache remembers the outcome of every link check in a run so that a URL linked
+    from many nodes is only requested once.
+
+    Known-good URLs are kept in a BloomFilter, so memory does not grow with the number of
+    distinct good URLs; a false positive only means a rare broken link is taken as good.
+    Broken URLs, which are few, are kept exactly.
+
+    Instance Attributes:
+        - good (BloomFilter): URLs that answered successfully.
+        - broken (set): URLs that were found broken.
+
+    LinkCache: [Int] [Float] -> LinkCache
+
+    Example:
+        -> cache = LinkCache()
+        -> cache.record('http://example.com/', False)
+        -> cache.lookup('http://example.com/')
+        False
+    """
+
+    def __init__(self, capacity=LINK_CACHE_CAPACITY, error_rate=LINK_CACHE_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def lookup(self, url):
+        """
+        lookup(url) returns True if url is known to be broken, False if it is known to be
+            good, and None if it has not been checked yet.
+
+        lookup: Str -> anyof(Bool, None)
+        """
+        if url in self.broken:
+            return True
+        if url in self.good:
+            return False
+        return None
+
+    def record(self, url, broken):
+        """
+        record(url, broken) stores the outcome of checking url.
+
+        record: Str Bool -> None
+        """
+        with self.lock:
+            if broken:
+                self.broken.add(url)
+            else:
+                self.good.add(url)
+
+    def reset(self):
+        """
+        reset() forgets every recorded outcome.
+
+        reset: () -> None
+        """
+        with self.lock:
+            self.good = BloomFilter(self.capacity, self.error_rate)
+            self.broken = set()
+
+
+class NodeStatus:
+    """
+    NodeStatus records the status code every node of the running scan answered its probe
+    with, so that a link from one page of the site to another node of the same scan is
+    answered from the probe instead of a request of its own.
+
+    A link is matched to a node by its "node/<n>" URL, or by the URL the node's probe ended
+    at after following redirects, so path aliases of nodes already probed match too. A link
+    to a node the scan has already handed to the pipeline gets a Future completed by that
+    node's probe. A link to a node not handed to it yet is not waited for, since the
+    pipeline may be blocked on the page holding the link; check_links defers it to the
+    retry pass instead. A scan that may stop before every node is handed out, such as a
+    priority scan, does not hold such links at all: they are checked on their own.
+
+    Instance Attributes:
+        - site (str): Base URL of the scanned site, or None outside a scan.
+        - expected (Int -> Bool): True for the nodes the scan will probe.
+        - fed (set): Nodes handed to the pipeline so far.
+        - hold_ahead (bool): True if links to nodes not handed out yet are deferred.
+        - status (dict): node -> status code of its probe, or None if the probe failed or
+          was skipped.
+        - aliases (dict): URL a probe ended at, without trailing slash -> node.
+        - waiting (dict): node -> list of Futures waiting for its probe.
+        - paused (bool): True while the scan is paused, when no link waits for a probe.
+        - closed (bool): True once the scan has stopped probing nodes.
+
+    NodeStatus: () -> NodeStatus
+
+    Example:
+        -> status = NodeStatus()
+        -> status.reset('http://example.com/', lambda node: 1 <= node < 100)
+        -> status.record(42, 404, 'http://example.com/about')
+        -> status.lookup('http://example.com/about/')
+        404
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.reset()
+
+    def reset(self, site=None, expected=None, hold_ahead=True):
+        """
+        reset([site][, expected][, hold_ahead]) forgets every recorded status and starts
+            tracking the nodes of site for which expected is True. Without site, no link is
+            a node link. Without hold_ahead, only nodes already handed out are waited for.
+
+        reset: [Str] [(Int -> Bool)] [Bool] -> None
+
+        Effects:
+            - Cancels the Futures still waiting for a probe.
+        """
+        with self.lock:
+            waiting = self.waiting
+            self.site = site
+            self.expected = expected if expected is not None else (lambda node: False)
+            self.fed = set()
+            self.hold_ahead = hold_ahead
+            self.status = {}
+            self.aliases = {}
+            self.waiting = {}
+            self.paused = False
+            self.closed = site is None
+        for futures in waiting.values():
+            for future in futures:
+                future.cancel()
+
+    def node_of(self, url):
+        """
+        node_of(url) returns n if url is "<site>node/<n>" with or without a trailing slash,
+            or a URL the probe of node n ended at, otherwise None.
+
+        node_of: Str -> anyof(Int, None)
+        """
+        prefix = f"{self.site}node/"
+        if self.site is None:
+            return None
+        if url.startswith(prefix):
+            rest = url[len(prefix):].rstrip('/')
+            if rest.isdigit():
+                return int(rest)
+        return self.aliases.get(url.rstrip('/'))
+
+    def track(self, nodes):
+        """
+        track(nodes) yields every node of nodes, remembering which were handed out.
+
+        track: (iterable of int) -> (generator of int)
+        """
+        for node in nodes:
+            with self.lock:
+                self.fed.add(node)
+            yield node
+
+    def record(self, node, status_code, url=None):
+        """
+        record(node, status_code[, url]) stores the status code of the probe of node, which
+            ended at url, and completes the Futures waiting for it.
+
+        record: Int anyof(Int, None) [anyof(Str, None)] -> None
+        """
+        with self.lock:
+            self.status[node] = status_code
+            if url is not None:
+                self.aliases[url.rstrip('/')] = node
+            futures = self.waiting.pop(node, [])
+        for future in futures:
+            future.set_result(status_code)
+
+    def release(self):
+        """
+        release() completes every Future waiting for a probe with None, so those links are
+            checked on their own.
+
+        release: () -> None
+        """
+        with self.lock:
+            waiting = self.waiting
+            self.waiting = {}
+        for futures in waiting.values():
+            for future in futures:
+                future.set_result(None)
+
+    def pause(self):
+        """
+        pause() stops links from waiting for probes while the scan is paused, since the
+            workers that would probe those nodes are parked.
+
+        pause: () -> None
+        """
+        with self.lock:
+            self.paused = True
+        self.release()
+
+    def resume(self):
+        """
+        resume() lets links wait for probes again once the scan is resumed.
+
+        resume: () -> None
+        """
+        with self.lock:
+            self.paused = False
+
+    def close(self):
+        """
+        close() marks the end of probing and completes every waiting Future with None.
+
+        close: () -> None
+        """
+        with self.lock:
+            self.closed = True
+        self.release()
+
+    def pending(self, node):
+        """
+        pending(node) returns True if the scan will probe node but has not done so yet.
+            Must be called with `lock` held.
+
+        pending: Int -> Bool
+        """
+        return not self.closed and not self.paused and node not in self.status \
+            and self.expected(node) and (self.hold_ahead or node in self.fed)
+
+    def ahead(self, url):
+        """
+        ahead(url) returns True if url is a node of the scan that has not been handed to
+            the pipeline yet and links to it are held.
+
+        ahead: Str -> Bool
+        """
+        node = self.node_of(url)
+        if node is None:
+            return False
+        with self.lock:
+            return self.pending(node) and node not in self.fed
+
+    def lookup(self, url):
+        """
+        lookup(url) returns the status code the node at url answered its probe with.
+
+        lookup: Str -> anyof(Int, None)
+
+        Returns:
+            - None if url is not a node of the scan, its probe failed or it was not probed
+              yet.
+        """
+        node = self.node_of(url)
+        with self.lock:
+            return self.status.get(node)
+
+    def watch(self, url):
+        """
+        watch(url) returns a Future of the status code the node at url answers its probe
+            with, or None if url is not a node of the scan. The Future is completed with None
+            if the probe fails, is skipped or never comes.
+
+        watch: Str -> anyof(Future, None)
+        """
+        node = self.node_of(url)
+        if node is None:
+            return None
+        future = Future()
+        with self.lock:
+            if self.pending(node):
+                self.waiting.setdefault(node, []).append(future)
+                return future
+            status_code = self.status.get(node)
+        future.set_result(status_code)
+        return future
+
+
+class AnalysisCache:
+    """
+    AnalysisCache remembers what was extracted from a page body, keyed by the page_hash of
+    the body, so a page identical to one seen before (in this run or an earlier one) is not
+    parsed again.
+
+    An entry holds the raw src of every image without alt text and the raw href of every
+    anchor with whether it has text. These are resolved against the URL of the page being
+    analysed, so one entry serves every node that serves the same body. At most `size`
+    entries are kept; the least recently used is evicted first.
+
+    Instance Attributes:
+        - size (int): Maximum number of entries.
+        - entries (OrderedDict): key -> [images, anchors], least recently used first.
+        - hits, misses (int): Lookups answered and not answered since load.
+
+    AnalysisCache: [Int] -> AnalysisCache
+
+    Example:
+        -> cache = AnalysisCache()
+        -> cache.store('ab12', ['/logo.png'], [['/about', True]])
+        -> cache.lookup('ab12')
+        [['/logo.png'], [['/about', True]]]
+    """
+
+    def __init__(self, size=ANALYSIS_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """
+        lookup(key) returns [images, anchors] stored under key, or None.
+
+        lookup: Str -> anyof(List, None)
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def store(self, key, images, anchors):
+        """
+        store(key, images, anchors) stores what was extracted from the page with key,
+            evicting the least recently used entry if the cache is full.
+
+        store: Str (listof str) (listof (Str, Bool)) -> None
+        """
+        with self.lock:
+            self.entries[key] = [images, anchors]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def load(self, path=ANALYSIS_CACHE_PATH):
+        """
+        load([path]) replaces the entries with those saved at path, if it exists.
+
+        load: [Path] -> None
+
+        Note: A file that cannot be read, such as one cut short, is treated as an empty cache.
+        """
+        entries = OrderedDict()
+        if path.exists():
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as file:
+                    entries.update(json.load(file))
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Ignoring unreadable analysis cache {path}: {e}")
+                entries = OrderedDict()
+        with self.lock:
+            self.entries = entries
+            self.hits = 0
+            self.misses = 0
+
+    def save(self, path=ANALYSIS_CACHE_PATH):
+        """
+        save([path]) saves the entries to path, least recently used first.
+
+        save: [Path] -> None
+
+        Effects:
+            - Writes a temporary file and moves it into place, so quitting mid-write leaves
+              the previous cache intact.
+        """
+        with self.lock:
+            entries = list(self.entries.items())
+        temp = path.with_name(path.name + '.tmp')
+        with gzip.open(temp, 'wt', encoding='utf-8') as file:
+            json.dump(dict(entries), file)
+        os.replace(temp, path)
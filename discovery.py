@@ -0,0 +1,243 @@
+## =======================================================
+## Program: Site Checker (discovery) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import math
+import random
+import re
+import requests
+
+
+DISCOVERY_BUCKET = 200
+DISCOVERY_SAMPLES = 8
+DISCOVERY_WINDOW = 8
+DISCOVERY_TAIL = 5
+DISCOVERY_CONFIDENCE = 0.01
+DISCOVERY_WORKERS = 16
+
+
+class NodeDiscovery:
+    """
+    NodeDiscovery describes which node numbers of a site are worth scanning: every node from
+    start_node up to the estimated end of the live node space, plus any node above it that
+    was found live or is listed in the sitemap. Sampling only estimates how many are live.
+
+    Instance Attributes:
+        - start_node (int): First node of the requested range.
+        - end_node (int): End (exclusive) of the requested range.
+        - highest (int): Estimated end (exclusive) of the live node space, at most end_node.
+        - windows (listof int): Sorted first nodes of the DISCOVERY_WINDOW windows that the
+          search for the highest node found live.
+        - buckets (listof (int, int, int)): (start, end, hits) of every sampled sub-range,
+          where hits is the number of live samples.
+        - listed (listof int): Sorted node numbers found in the site's sitemap.
+        - estimate (int): Estimated number of live nodes in the range, or None if no sample
+          was live.
+
+    NodeDiscovery: Int Int -> NodeDiscovery
+
+    Example:
+        -> discovery = discover_nodes('http://example.com/', 1, 5000)
+        -> for node in discovery.nodes():
+        ->     ...
+    """
+
+    def __init__(self, start_node, end_node):
+        self.start_node = start_node
+        self.end_node = end_node
+        self.highest = end_node
+        self.windows = []
+        self.buckets = []
+        self.listed = []
+        self.estimate = 0
+
+    def nodes(self):
+        """
+        nodes() yields, in increasing order, every node in [start_node, highest), every node
+            of a window found live and every node listed in the sitemap.
+
+        nodes: () -> (generator of int)
+        """
+        windows = (range(start, min(start + DISCOVERY_WINDOW, self.end_node)) for start in self.windows)
+        last = None
+        for node in heapq.merge(range(self.start_node, self.highest), *windows, self.listed):
+            if node != last:
+                last = node
+                yield node
+
+    def count(self):
+        """
+        count() returns the number of nodes that nodes() yields.
+
+        count: () -> Int
+        """
+        above = {node for start in self.windows
+                 for node in range(max(start, self.highest), min(start + DISCOVERY_WINDOW, self.end_node))}
+        above.update(node for node in self.listed if node >= self.highest)
+        return self.highest - self.start_node + len(above)
+
+    def covers(self, node):
+        """
+        covers(node) returns True if nodes() yields node.
+
+        covers: Int -> Bool
+        """
+        if self.start_node <= node < self.highest:
+            return True
+        index = bisect.bisect_right(self.windows, node)
+        if index and node < self.windows[index - 1] + DISCOVERY_WINDOW and node < self.end_node:
+            return True
+        index = bisect.bisect_left(self.listed, node)
+        return index < len(self.listed) and self.listed[index] == node
+
+
+def node_live(site, node):
+    """
+    node_live(site, node) returns True if "<site>node/<node>/" answers with status 200.
+
+    node_live: Str Int -> Bool
+    """
+    try:
+        response = requests.head(site + f"node/{node}/", allow_redirects=True, timeout=5)
+    except requests.exceptions.RequestException:
+        return False
+    return response.status_code == 200
+
+
+def window_live(site, node, executor):
+    """
+    window_live(site, node, executor) returns True if any of the DISCOVERY_WINDOW nodes from
+        node onwards is live. Probing a window rather than one node copes with gaps.
+
+    window_live: Str Int ThreadPoolExecutor -> Bool
+    """
+    return any(executor.map(lambda n: node_live(site, n), range(node, node + DISCOVERY_WINDOW)))
+
+
+def sitemap_nodes(site, start_node, end_node):
+    """
+    sitemap_nodes(site, start_node, end_node) returns the sorted node numbers in
+        [start_node, end_node) that appear as "/node/<n>" in the site's sitemap.xml.
+
+    sitemap_nodes: Str Int Int -> (listof int)
+
+    Note: WCMS sitemaps mostly list path aliases, so this is often empty.
+    """
+    try:
+        response = requests.get(site + "sitemap.xml", timeout=5)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return []
+    found = {int(n) for n in re.findall(r'/node/(\d+)', response.text)}
+    return sorted(n for n in found if start_node <= n < end_node)
+
+
+def highest_live_node(site, start_node, end_node, executor):
+    """
+    highest_live_node(site, start_node, end_node, executor) returns an estimated end
+        (exclusive) of the live node space in [start_node, end_node), and the first nodes
+        of the windows found live on the way.
+
+    Probes windows at start_node + 1, 2, 4, 8, ... to find the last live one, then binary
+    searches between it and the next probed window. Returns end_node if no window is live.
+
+    highest_live_node: Str Int Int ThreadPoolExecutor -> (Int, (listof int))
+    """
+    positions = []
+    step = 1
+    while start_node + step < end_node:
+        positions.append(start_node + step)
+        step *= 2
+    live = [position for position in positions if window_live(site, position, executor)]
+    if not live:
+        return end_node, []
+    low = live[-1]
+    following = [position for position in positions if position > low]
+    high = following[0] if following else end_node
+    while high - low > DISCOVERY_WINDOW:
+        middle = (low + high) // 2
+        if window_live(site, middle, executor):
+            low = middle
+            live.append(middle)
+        else:
+            high = middle
+    return min(end_node, high + DISCOVERY_WINDOW), sorted(live)
+
+
+def empty_run_needed(buckets):
+    """
+    empty_run_needed(buckets) returns how many sub-ranges in a row must have no live sample
+        before sampling can stop, given the sub-ranges sampled so far.
+
+    At the live density seen so far, that many empty sub-ranges in a row happen by chance
+    with a probability below DISCOVERY_CONFIDENCE. It is at least DISCOVERY_TAIL.
+
+    empty_run_needed: (listof (int, int, int)) -> Int
+    """
+    hits = sum(hits for _, _, hits in buckets)
+    if not hits:
+        return DISCOVERY_TAIL
+    density = hits / (len(buckets) * DISCOVERY_SAMPLES)
+    if density >= 1:
+        return DISCOVERY_TAIL
+    empty = DISCOVERY_SAMPLES * math.log(1 - density)
+    return max(DISCOVERY_TAIL, math.ceil(math.log(DISCOVERY_CONFIDENCE) / empty))
+
+
+def discover_nodes(site, start_node, end_node):
+    """
+    discover_nodes(site, start_node, end_node) estimates the live node set of site within
+        [start_node, end_node) before a scan.
+
+    discover_nodes: Str Int Int -> NodeDiscovery
+
+    Effects:
+        - Reads the site's sitemap.xml and sends HEAD requests to a sample of nodes:
+          a galloping search for the highest live node, then DISCOVERY_SAMPLES per
+          DISCOVERY_BUCKET nodes. Because the galloping search can be fooled by a long
+          unused stretch, sampling only stops once it is past that estimate and enough
+          sub-ranges in a row had no live sample (see empty_run_needed); a live sample
+          past the estimate raises it. If sampling reaches end_node without stopping, the
+          scan goes up to end_node.
+
+    Note: Sampling never removes nodes below the estimated highest node from the scan; it
+          only gives the estimate. If no sample is live the estimate is None and the whole
+          range is scanned.
+
+    Example:
+        discovery = discover_nodes('http://example.com/', 1, 5000)
+        print(f"About {discovery.estimate} live nodes")
+    """
+    discovery = NodeDiscovery(start_node, end_node)
+    discovery.listed = sitemap_nodes(site, start_node, end_node)
+    sampler = random.Random(start_node)
+    with ThreadPoolExecutor(max_workers=DISCOVERY_WORKERS) as executor:
+        highest, discovery.windows = highest_live_node(site, start_node, end_node, executor)
+        empty_run = 0
+        for start in range(start_node, end_node, DISCOVERY_BUCKET):
+            if start >= highest and empty_run >= empty_run_needed(discovery.buckets):
+                break
+            end = min(start + DISCOVERY_BUCKET, end_node)
+            samples = sampler.sample(range(start, end), min(DISCOVERY_SAMPLES, end - start))
+            hits = sum(executor.map(lambda n: node_live(site, n), samples))
+            discovery.buckets.append((start, end, hits))
+            discovery.estimate += round(hits / len(samples) * (end - start))
+            empty_run = 0 if hits else empty_run + 1
+            if hits:
+                highest = max(highest, end)
+        else:
+            # Sampling reached the end without a convincing empty stretch, so nothing is cut.
+            highest = end_node
+    if not any(hits for _, _, hits in discovery.buckets):
+        highest = end_node
+        discovery.estimate = None
+    discovery.highest = highest
+    return discovery
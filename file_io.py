@@ -7,11 +7,16 @@
 ## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
 ## =======================================================
 
+from array import array
 from bitarray import bitarray
 import datetime
+import gzip
 import json
+import os
 from pathlib import Path
 import sys
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
 
@@ -238,19 +243,37 @@ def remove_progress():
     """
     progress_txt = Path('progress.txt')
     progress_bin = Path('progress.bin')
+    progress_idx = Path('progress.idx')
     if progress_txt.exists():
         progress_txt.unlink()
 
     if progress_bin.exists():
         progress_bin.unlink()
 
+    if progress_idx.exists():
+        progress_idx.unlink()
 
-def write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, broken_bool):
+
+def result_path(output_name, kind='result'):
+    """
+    result_path(output_name[, kind]) returns the path of today's output file of the given kind
+        on the user's desktop, named "{output_name}{kind}_{time_str}.txt".
+
+    result_path: Str [Str] -> Path
+
+    Example:
+        result_path('mme_')              # ~/Desktop/mme_result_{time_str}.txt
+        result_path('mme_', 'sitewide')  # ~/Desktop/mme_sitewide_{time_str}.txt
+    """
+    return user_desktop / f'{output_name}{kind}_{time_str}.txt'
+
+
+def write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, broken_bool, kind='result'):
     """
-    write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, broken_bool)
+    write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, broken_bool[, kind])
     writes the accessibility issues and broken URLs into a text file on the user's desktop.
 
-    write_to_file: Str Str (listof str) (listof str) Bool Bool -> None
+    write_to_file: Str Str (listof str) (listof str) Bool Bool [Str] -> None
 
     Requires:
         - output_name is a string specifying the prefix of the output file name.
@@ -259,6 +282,7 @@ def write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, bro
         - broken_urls is a list of strings, each representing a broken URL.
         - acc_bool is a boolean that indicates whether to write accessibility issues to the file.
         - broken_bool is a boolean that indicates whether to write broken URLs to the file.
+        - kind names the output file, "result" by default (see result_path).
 
         Note: The function internally uses `user_desktop` and `time_str` which should be available
               in the scope.
@@ -275,7 +299,7 @@ def write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, bro
         This writes the base URL, accessibility issues, and broken URLs into a text file named
         "check_resultsresult_{time_str}.txt" on the user's desktop.
     """
-    output_file_path = user_desktop / f'{output_name}result_{time_str}.txt'
+    output_file_path = result_path(output_name, kind)
     with open(output_file_path, 'a', encoding='utf-8') as file:
         file.write(f"base_url: {base_url}\n")
         if acc_bool:
@@ -289,6 +313,341 @@ def write_to_file(output_name, base_url, acc_problem, broken_urls, acc_bool, bro
         file.write("\n")
 
 
+def node_number(base_url):
+    """
+    node_number(base_url) returns the node number in a URL of the form "<site>node/<n>/",
+        or None if base_url is not a node URL.
+
+    node_number: Str -> anyof(Int, None)
+
+    Example:
+        node_number('http://example.com/node/42/')  # 42
+    """
+    try:
+        return int(base_url.split('/node/')[1].split('/')[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def format_nodes(nodes):
+    """
+    format_nodes(nodes) returns nodes, a sorted sequence of node numbers, as a compact string
+        of ranges.
+
+    format_nodes: (listof int) -> Str
+
+    Example:
+        format_nodes([1, 2, 3, 7, 9, 10])  # '1-3, 7, 9-10'
+    """
+    parts = []
+    start = previous = None
+    for node in nodes:
+        if previous is not None and node == previous + 1:
+            previous = node
+            continue
+        if start is not None:
+            parts.append(f"{start}-{previous}" if previous != start else f"{start}")
+        start = previous = node
+    if start is not None:
+        parts.append(f"{start}-{previous}" if previous != start else f"{start}")
+    return ', '.join(parts)
+
+
+class ProblemIndex:
+    """
+    ProblemIndex is an inverted index from each reported problem URL to the nodes it was
+    found on, built while the scan runs.
+
+    Written out by write(), it lists every distinct problem once with its nodes as compact
+    ranges, so its size follows the number of distinct problems instead of occurrences.
+    Node numbers are kept in compact integer arrays.
+
+    Instance Attributes:
+        - entries (dict): (kind, url) -> array of node numbers, where kind is
+          "acc_problem" or "broken_url".
+
+    ProblemIndex: () -> ProblemIndex
+
+    Example:
+        -> index = ProblemIndex()
+        -> index.add('broken_url', 'http://example.com/missing', 42)
+        -> index.write('mme_')
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def add(self, kind, url, node):
+        """
+        add(kind, url, node) records that url was reported as kind on node.
+
+        add: Str Str Int -> None
+        """
+        with self.lock:
+            self.entries.setdefault((kind, url), array('L')).append(node)
+
+    def reset(self):
+        """
+        reset() empties the index.
+
+        reset: () -> None
+        """
+        with self.lock:
+            self.entries = {}
+
+    def save(self):
+        """
+        save() writes the index to 'progress.idx' so that a resumed scan can continue it.
+
+        save: () -> None
+
+        Effects:
+            - Writes a temporary file and moves it into place, so quitting mid-write leaves
+              the previous index intact.
+        """
+        with self.lock:
+            data = [[kind, url, list(nodes)] for (kind, url), nodes in self.entries.items()]
+        with open('progress.idx.tmp', 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace('progress.idx.tmp', 'progress.idx')
+
+    def load(self):
+        """
+        load() restores the index saved in 'progress.idx', if it exists.
+
+        load: () -> None
+        """
+        progress_idx = Path('progress.idx')
+        if progress_idx.exists():
+            with progress_idx.open('r', encoding='utf-8') as file:
+                data = json.load(file)
+            with self.lock:
+                self.entries = {(kind, url): array('L', nodes) for kind, url, nodes in data}
+
+    def write(self, output_name):
+        """
+        write(output_name) writes the index to "{output_name}index_{time_str}.txt" on the
+            user's desktop, most widespread problems first.
+
+        write: Str -> None
+
+        Effects:
+            - Overwrites the index file; does nothing if the index is empty.
+        """
+        with self.lock:
+            entries = [(kind, url, sorted(set(nodes))) for (kind, url), nodes in self.entries.items()]
+        if not entries:
+            return
+        entries.sort(key=lambda entry: (-len(entry[2]), entry[0], entry[1]))
+        with open(result_path(output_name, 'index'), 'w', encoding='utf-8') as file:
+            for kind, url, nodes in entries:
+                file.write(f"{kind}: {url}\n")
+                file.write(f"    nodes ({len(nodes)}): {format_nodes(nodes)}\n")
+
+
+def state_path(output_name):
+    """
+    state_path(output_name) returns the path of the saved results of the last scan of the
+        site named by output_name, in the current working directory.
+
+    state_path: Str -> Path
+    """
+    return Path(f'{output_name}state.json.gz')
+
+
+class ScanState:
+    """
+    ScanState keeps the results of the last scan of a site so that the next scan can be run
+    as a diff against it.
+
+    For every node it stores the page hash, the broken URLs and accessibility problems found
+    on it, when its page last changed and the nodes it links to. A diff scan skips parsing
+    pages whose hash is unchanged, re-checks only the links that were broken last time, and
+    reports what was fixed, what is new and what is unchanged. A priority scan ranks nodes
+    by the same results.
+
+    Instance Attributes:
+        - diff (bool): True if the running scan is a diff scan.
+        - previous (dict): node -> [hash, broken_urls, acc_problem, changed, links] from
+          earlier scans, where changed is a time.time() value, or None if it is unknown, and
+          links a list of nodes. Entries saved before changed and links were kept have only
+          the first three.
+        - current (dict): node -> the same entry from the running scan.
+        - hashes (dict): node -> page hash seen by the running scan.
+        - modified (dict): node -> time.time() value of the Last-Modified header of its page.
+        - links (dict): node -> nodes linked from its page, seen by the running scan.
+
+    ScanState: () -> ScanState
+
+    Example:
+        -> state = ScanState()
+        -> state.load('mme_')
+        -> state.record(42, ['http://example.com/missing'], [])
+        -> state.save('mme_')
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.diff = False
+        self.reset()
+
+    def reset(self):
+        """
+        reset() forgets every stored result.
+
+        reset: () -> None
+        """
+        with self.lock:
+            self.previous = {}
+            self.current = {}
+            self.hashes = {}
+            self.modified = {}
+            self.links = {}
+
+    def load(self, output_name):
+        """
+        load(output_name) loads the saved results of the site named by output_name, if any.
+
+        load: Str -> Bool
+
+        Returns:
+            - True if saved results were found, otherwise False. A file that cannot be read,
+              such as one cut short, counts as no saved results.
+        """
+        path = state_path(output_name)
+        if not path.exists():
+            return False
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, EOFError, ValueError) as e:
+            print(f"Ignoring unreadable scan state {path}: {e}")
+            return False
+        with self.lock:
+            self.previous = {int(node): entry for node, entry in data.items()}
+        return True
+
+    def known(self, node):
+        """
+        known(node) returns the entry of node from earlier scans, or None.
+
+        known: Int -> anyof(List, None)
+        """
+        return self.previous.get(node)
+
+    def set_hash(self, node, digest):
+        """
+        set_hash(node, digest) records the page hash of node seen by the running scan.
+
+        set_hash: Int Str -> None
+        """
+        with self.lock:
+            self.hashes[node] = digest
+
+    def set_modified(self, node, modified):
+        """
+        set_modified(node, modified) records when the server says the page of node was last
+            modified, as a time.time() value.
+
+        set_modified: Int Float -> None
+        """
+        with self.lock:
+            self.modified[node] = modified
+
+    def set_links(self, node, nodes):
+        """
+        set_links(node, nodes) records the nodes linked from the page of node.
+
+        set_links: Int (listof int) -> None
+        """
+        with self.lock:
+            self.links[node] = nodes
+
+    def inlinks(self):
+        """
+        inlinks() returns how many pages of earlier scans link to each node.
+
+        inlinks: () -> (dictof Int Int)
+        """
+        counts = {}
+        for entry in self.previous.values():
+            for node in entry[4] if len(entry) > 4 else []:
+                counts[node] = counts.get(node, 0) + 1
+        return counts
+
+    def record(self, node, broken_urls, acc_problem):
+        """
+        record(node, broken_urls, acc_problem) stores the results of node and returns the
+            difference with the previous scan.
+
+        record: Int (listof str) (listof str) -> ((listof str), (listof str), (listof str))
+
+        Returns:
+            - fixed, new and unchanged problems, each written as "broken_url: <url>" or
+              "acc_problem: <url>".
+
+        Note: The page counts as changed when the server sent its Last-Modified time, or
+              otherwise when its hash differs from the previous scan. A node seen for the
+              first time without that header has no known change time.
+        """
+        problems = [f"broken_url: {url}" for url in broken_urls] + [f"acc_problem: {url}" for url in acc_problem]
+        with self.lock:
+            digest = self.hashes.get(node)
+            entry = self.previous.get(node)
+            if node in self.modified:
+                changed = self.modified[node]
+            elif entry is None:
+                changed = None
+            elif digest is not None and entry[0] != digest:
+                changed = time.time()
+            else:
+                changed = entry[3] if len(entry) > 3 else None
+            self.current[node] = [digest, broken_urls, acc_problem, changed, self.links.get(node, [])]
+        before = [] if entry is None else \
+            [f"broken_url: {url}" for url in entry[1]] + [f"acc_problem: {url}" for url in entry[2]]
+        fixed = [problem for problem in before if problem not in problems]
+        new = [problem for problem in problems if problem not in before]
+        unchanged = [problem for problem in problems if problem in before]
+        return fixed, new, unchanged
+
+    def save(self, output_name):
+        """
+        save(output_name) saves the earlier results updated with those of the running scan.
+
+        save: Str -> None
+
+        Effects:
+            - Writes a temporary file and moves it into place, so quitting mid-write leaves
+              the previous results intact.
+        """
+        with self.lock:
+            data = {**self.previous, **self.current}
+        path = state_path(output_name)
+        temp = path.with_name(path.name + '.tmp')
+        with gzip.open(temp, 'wt', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp, path)
+
+
+def write_diff(output_name, base_url, fixed, new, unchanged):
+    """
+    write_diff(output_name, base_url, fixed, new, unchanged) appends the difference between
+        this scan and the previous one for base_url to "{output_name}diff_{time_str}.txt" on
+        the user's desktop.
+
+    write_diff: Str Str (listof str) (listof str) (listof str) -> None
+    """
+    with open(result_path(output_name, 'diff'), 'a', encoding='utf-8') as file:
+        file.write(f"base_url: {base_url}\n")
+        for title, problems in (('fixed', fixed), ('new', new), ('unchanged', unchanged)):
+            if problems:
+                file.write(f"    {title}:\n")
+                for index, item in enumerate(problems, start=1):
+                    file.write(f"        {index}. {item}\n")
+        file.write("\n")
+
+
 def load_config(file_path):
     """
     load_config(file_path) returns a dictionary obtained by reading a JSON file
@@ -348,13 +707,13 @@ def parse_and_sort(output_name):
 
         This will read 'analysis_result_{time_str}.txt', sort its content, and overwrite the file with sorted data.
     """
-    output_file_path = user_desktop / f'{output_name}result_{time_str}.txt'
+    output_file_path = result_path(output_name)
     if output_file_path.exists():
         with open(output_file_path, 'r') as file:
             content = file.read()
 
         blocks = content.strip().split('\n\n')
-        sorted_blocks = sorted(blocks, key=lambda block: int(block.split('/node/')[1].split('/')[0]))
+        sorted_blocks = sorted(blocks, key=node_number)
         sorted_content = '\n\n'.join(sorted_blocks)
 
         with open(output_file_path, 'w') as file:
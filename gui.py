@@ -10,6 +10,7 @@
 import io
 import threading
 from tkinter import scrolledtext
+from tkinter import filedialog
 from tkinter import messagebox
 from operations import *
 
@@ -74,6 +75,7 @@ class SiteCheckerApp:
         self.progress_var.set(0)
         self.update_progress_label()
         self.output_text.delete('1.0', tk.END)
+        self.pause_button.config(text='Pause')
         base_link = self.site_entry.get()
 
         def thread_target():
@@ -82,16 +84,33 @@ class SiteCheckerApp:
             end = self.end_var.get()
             mode = self.mode_var.get()
             speed = self.speed_var.get()
+            record = self.record_var.get()
+            discover = self.discover_var.get()
+            diff = self.diff_var.get()
+            timebox = self.timebox_var.get().strip()
             mode_dict = {'Default': 0, 'Accessibility Only': 1, 'Broken Links Only': 2, 'Acc and Broken Links': 3}
             try:
                 if valid_site and start and end:
                     start, end = int(start), int(end)
-                    range_check(self, site, start, end + 1, mode_dict[mode], output_name, speed)
+                    timebox = float(timebox) if timebox else None
+                    discovery = None
+                    if discover:
+                        print("Discovering live nodes...")
+                        discovery = discover_nodes(site, start, end + 1)
+                        if discovery.estimate is None:
+                            self.estimate_label.config(text="Live nodes unknown")
+                            print("No sampled node was live, scanning the whole range")
+                        else:
+                            self.estimate_label.config(text=f"~{discovery.estimate} live nodes")
+                            print(f"Estimated {discovery.estimate} live nodes below node {discovery.highest}, "
+                                  f"scanning {discovery.count()} of {end + 1 - start} nodes")
+                    range_check(self, site, start, end + 1, mode_dict[mode], output_name, speed, record, discovery,
+                                diff, timebox)
                 elif valid_site and (start or end):
                     node = int(start) if start else int(end)
-                    node_check(self, site, node, mode_dict[mode], output_name)
+                    node_check(self, site, node, mode_dict[mode], output_name, record, diff)
             except ValueError:
-                self.output_text.insert(tk.END, "Please enter valid numbers for start and end nodes.\n")
+                self.output_text.insert(tk.END, "Please enter valid numbers for start and end nodes and time box.\n")
             except KeyError:
                 self.output_text.insert(tk.END, "Please select a valid mode.\n")
 
@@ -105,11 +124,45 @@ class SiteCheckerApp:
             self.start_var.set('')
             self.end_var.set('')
             self.speed_var.set(0)
+            self.timebox_var.set('')
             self.progress_var.set(0)
             self.output_text.delete('1.0', tk.END)
             self.update_progress_label()
             remove_progress()
 
+    def replay(self):
+        path = filedialog.askopenfilename(title="Select a recorded archive", initialdir=user_desktop,
+                                          filetypes=[("Site Checker archive", "*.jsonl.gz")])
+        if not path:
+            return
+        self.progress_var.set(0)
+        self.output_text.delete('1.0', tk.END)
+        mode_dict = {'Default': 0, 'Accessibility Only': 1, 'Broken Links Only': 2, 'Acc and Broken Links': 3}
+        output_name = Path(path).name.split('archive_')[0] + 'replay_'
+
+        replay_thread = threading.Thread(target=replay_check,
+                                         args=(self, path, mode_dict[self.mode_var.get()], output_name))
+        replay_thread.daemon = True
+        replay_thread.start()
+
+    def pause(self):
+        if self.pause_button.config('text')[-1] == 'Pause':
+            scan_control.pause()
+            node_status.pause()
+            self.pause_button.config(text='Resume')
+            print("Pausing after the nodes in progress...")
+        else:
+            scan_control.resume()
+            node_status.resume()
+            self.pause_button.config(text='Pause')
+            print("Resumed")
+
+    def cancel(self):
+        if messagebox.askokcancel("Cancel", "Do you want to stop the check? Progress will be saved."):
+            scan_control.cancel()
+            node_status.close()
+            self.pause_button.config(text='Pause')
+
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit? All ongoing operations will be terminated."):
             self.root.destroy()
@@ -131,6 +184,10 @@ class SiteCheckerApp:
         self.start_var = tk.StringVar()
         self.end_var = tk.StringVar()
         self.speed_var = tk.IntVar()
+        self.record_var = tk.BooleanVar()
+        self.discover_var = tk.BooleanVar()
+        self.diff_var = tk.BooleanVar()
+        self.timebox_var = tk.StringVar()
 
         self.create_widgets()
 
@@ -152,7 +209,7 @@ class SiteCheckerApp:
 
     def speed(self):
         if self.speed_button.config('text')[-1] == 'Use fast mode':
-            if messagebox.askokcancel("Mode", "Do you want to use high speed mode? The process cannot be paused."):
+            if messagebox.askokcancel("Mode", "Do you want to use high speed mode?"):
                 self.fast_gui()
         else:
             if messagebox.askokcancel("Mode", "Do you want to use default? The check will be more safe."):
@@ -181,6 +238,15 @@ class SiteCheckerApp:
         self.res_button = ttk.Button(self.frame, width=15, text="Reset", command=self.reset)
         self.speed_button = ttk.Button(self.frame, width=15, text="Use fast mode", command=self.speed)
         self.speed_label = ttk.Label(self.frame)
+        self.pause_button = ttk.Button(self.frame, width=15, text="Pause", command=self.pause)
+        self.cancel_button = ttk.Button(self.frame, width=15, text="Cancel", command=self.cancel)
+        self.record_check = ttk.Checkbutton(self.frame, text="Record archive", variable=self.record_var)
+        self.replay_button = ttk.Button(self.frame, width=15, text="Replay", command=self.replay)
+        self.discover_check = ttk.Checkbutton(self.frame, text="Discover live nodes", variable=self.discover_var)
+        self.estimate_label = ttk.Label(self.frame)
+        self.diff_check = ttk.Checkbutton(self.frame, text="Diff with last scan", variable=self.diff_var)
+        self.timebox_label = ttk.Label(self.frame, text="Time box (min):")
+        self.timebox_entry = ttk.Entry(self.frame, width=15, textvariable=self.timebox_var)
 
         self.quit_button = ttk.Button(self.frame, width=15, text="Quit", command=self.on_closing)
         self.quit_res_button = ttk.Button(self.frame, width=15, text="Quit With Reset", command=self.res_quit)
@@ -213,6 +279,15 @@ class SiteCheckerApp:
         self.res_button.grid(columnspan=1, column=4, row=1, pady=10, sticky=tk.W)
         self.speed_button.grid(columnspan=2, column=5, row=1, pady=20, sticky=tk.W)
         self.speed_label.grid(columnspan=2, column=4, row=3, pady=20, sticky=tk.W)
+        self.pause_button.grid(columnspan=1, column=7, row=1, pady=10, sticky=tk.W)
+        self.cancel_button.grid(columnspan=1, column=7, row=2, pady=10, sticky=tk.W)
+        self.record_check.grid(columnspan=1, column=6, row=3, pady=10, sticky=tk.W)
+        self.replay_button.grid(columnspan=1, column=7, row=3, pady=10, sticky=tk.W)
+        self.discover_check.grid(columnspan=1, column=6, row=2, pady=10, sticky=tk.W)
+        self.diff_check.grid(columnspan=1, column=8, row=1, pady=10, sticky=tk.W)
+        self.estimate_label.grid(columnspan=1, column=6, row=4, pady=10, sticky=tk.W)
+        self.timebox_label.grid(columnspan=1, column=8, row=2, pady=10, sticky=tk.W)
+        self.timebox_entry.grid(columnspan=1, column=8, row=3, pady=10, sticky=tk.W)
 
         self.quit_button.grid(columnspan=1, column=3, row=2, pady=10)
         self.quit_res_button.grid(columnspan=1, column=4, row=2, pady=10, sticky=tk.W)
@@ -10,11 +10,431 @@
 
 import aiohttp
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+import heapq
+from itertools import islice
 import requests
 import threading
-from urllib.parse import urljoin
+import time
+from urllib.parse import urljoin, urlsplit
+from archive import *
+from cache import *
+from discovery import *
 from file_io import *
+from pipeline import *
+from scheduler import *
+from template import *
+
+
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 30
+UNREACHABLE_NOTE = ' (host unreachable)'
+NODE_BUDGET = 10
+RUN_BUDGET = None
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 50
+UNRESOLVED_NOTE = ' (unresolved)'
+CHECKPOINT_INTERVAL = 50
+PIPELINE_QUEUE_SIZE = 20
+PIPELINE_WORKERS = {'probe': 4, 'fetch': 4, 'parse': 2, 'links': 8}
+SLOW_PIPELINE_WORKERS = {'probe': 1, 'fetch': 1, 'parse': 1, 'links': 1}
+PRIORITY_REQUEST_BUDGET = None
+PRIORITY_PROBLEM_WEIGHT = 10
+PRIORITY_LINK_WEIGHT = 1
+PRIORITY_CHANGE_WEIGHT = 20
+PRIORITY_RECENT_DAYS = 30
+
+
+class HostBreaker:
+    """
+    HostBreaker is a per-host circuit breaker shared by every link check in a run.
+
+    After `threshold` consecutive connection errors or timeouts against the same host the
+    breaker opens: later checks to that host fail immediately instead of waiting out the
+    request timeout, and a background thread probes the host every `cooldown` seconds
+    until it answers again, at which point the breaker closes.
+
+    Instance Attributes:
+        - threshold (int): Consecutive failures needed to open the breaker for a host.
+        - cooldown (int): Seconds between background probes of an open host.
+        - failures (dict): host -> number of consecutive connection failures.
+        - open_hosts (set): Hosts whose breaker is currently open.
+        - tripped (set): Hosts whose breaker opened at least once during this run.
+
+    HostBreaker: [Int] [Int] -> HostBreaker
+
+    Example:
+        -> breaker = HostBreaker()
+        -> if breaker.allow('http://example.com/page'):
+        ->     ...
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.open_hosts = set()
+        self.tripped = set()
+        self.generation = 0
+
+    def allow(self, url):
+        """
+        allow(url) returns False if the breaker for the host of url is open, otherwise True.
+
+        allow: Str -> Bool
+        """
+        return urlsplit(url).netloc not in self.open_hosts
+
+    def record_success(self, url):
+        """
+        record_success(url) clears the failure count of the host of url.
+
+        record_success: Str -> None
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            self.failures.pop(host, None)
+
+    def record_failure(self, url):
+        """
+        record_failure(url) counts a connection error or timeout against the host of url and
+            opens its breaker once the threshold is reached.
+
+        record_failure: Str -> None
+
+        Effects:
+            - Starts a background probe thread when the breaker opens.
+        """
+        parts = urlsplit(url)
+        host = parts.netloc
+        with self.lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if self.failures[host] < self.threshold or host in self.open_hosts:
+                return
+            self.open_hosts.add(host)
+            self.tripped.add(host)
+            generation = self.generation
+        print(f"Host {host} unreachable, skipping its links until it recovers")
+        probe_url = f"{parts.scheme}://{host}/"
+        thread = threading.Thread(target=self.probe, args=(host, probe_url, generation))
+        thread.daemon = True
+        thread.start()
+
+    def probe(self, host, probe_url, generation):
+        """
+        probe(host, probe_url, generation) polls probe_url every `cooldown` seconds and
+            closes the breaker of host as soon as the host answers with any status code.
+
+        probe: Str Str Int -> None
+        """
+        while True:
+            time.sleep(self.cooldown)
+            if generation != self.generation:
+                return
+            try:
+                requests.head(probe_url, allow_redirects=False, timeout=5)
+            except requests.exceptions.RequestException:
+                continue
+            with self.lock:
+                if generation == self.generation:
+                    self.open_hosts.discard(host)
+                    self.failures.pop(host, None)
+            print(f"Host {host} reachable again")
+            return
+
+    def label(self, url):
+        """
+        label(url) returns url marked as "host unreachable" if the breaker of its host opened
+            during this run, otherwise url unchanged.
+
+        label: Str -> Str
+        """
+        if urlsplit(url).netloc in self.tripped:
+            return url + UNREACHABLE_NOTE
+        return url
+
+    def reset(self):
+        """
+        reset() closes every breaker and stops the background probes of the previous run.
+
+        reset: () -> None
+        """
+        with self.lock:
+            self.generation += 1
+            self.failures.clear()
+            self.open_hosts.clear()
+            self.tripped.clear()
+
+
+host_breaker = HostBreaker()
+link_cache = LinkCache()
+analysis_cache = AnalysisCache()
+node_status = NodeStatus()
+http_archive = HttpArchive()
+site_template = SiteTemplate()
+problem_index = ProblemIndex()
+scan_state = ScanState()
+
+
+class LatencyTracker:
+    """
+    LatencyTracker keeps a sliding window of recent link-check latencies so that slow
+    requests can be recognised and hedged.
+
+    Instance Attributes:
+        - samples (deque): The most recent latencies in seconds, newest last.
+        - min_samples (int): Number of samples needed before percentile() answers.
+
+    LatencyTracker: [Int] [Int] -> LatencyTracker
+
+    Example:
+        -> tracker = LatencyTracker()
+        -> tracker.observe(0.12)
+        -> tracker.percentile(95)
+    """
+
+    def __init__(self, window=500, min_samples=HEDGE_MIN_SAMPLES):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds):
+        """
+        observe(seconds) records the latency of one successful request.
+
+        observe: Float -> None
+        """
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        """
+        percentile(p) returns the p-th percentile of the recorded latencies, or None while
+            fewer than `min_samples` latencies have been recorded.
+
+        percentile: Int -> anyof(Float, None)
+        """
+        samples = sorted(self.samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, len(samples) * p // 100)]
+
+
+link_latency = LatencyTracker()
+
+
+class ScanControl:
+    """
+    ScanControl lets the GUI pause, resume and cancel a running scan cooperatively.
+
+    Scan workers call wait() between nodes, so a node that is already in flight always
+    finishes. Once every worker is waiting on a pause, `on_idle` is called exactly once so
+    the scan can flush its checkpoint.
+
+    Instance Attributes:
+        - paused (bool): True while the scan is paused.
+        - cancelled (bool): True once the scan has been asked to stop.
+        - workers (int): Number of workers that have not finished yet.
+        - idle (int): Number of workers currently waiting on a pause.
+
+    ScanControl: () -> ScanControl
+
+    Example:
+        -> control = ScanControl()
+        -> control.start(10, on_idle=flush)
+        -> while control.wait():
+        ->     ...
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.paused = False
+        self.cancelled = False
+        self.workers = 0
+        self.idle = 0
+        self.on_idle = None
+        self.flushed = False
+
+    def start(self, workers, on_idle=None):
+        """
+        start(workers[, on_idle]) prepares the control for a new scan run by `workers` threads.
+
+        start: Int [(() -> None)] -> None
+        """
+        with self.condition:
+            self.paused = False
+            self.cancelled = False
+            self.workers = workers
+            self.idle = 0
+            self.on_idle = on_idle
+            self.flushed = False
+
+    def pause(self):
+        """
+        pause() asks every worker to stop after its in-flight node.
+
+        pause: () -> None
+        """
+        with self.condition:
+            self.paused = True
+            self.flushed = False
+
+    def resume(self):
+        """
+        resume() lets paused workers continue.
+
+        resume: () -> None
+        """
+        with self.condition:
+            self.paused = False
+            self.condition.notify_all()
+
+    def cancel(self):
+        """
+        cancel() asks every worker to stop after its in-flight node, even while paused.
+
+        cancel: () -> None
+        """
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+
+    def wait(self):
+        """
+        wait() blocks while the scan is paused and returns False once it has been cancelled,
+            otherwise True.
+
+        wait: () -> Bool
+        """
+        with self.condition:
+            if self.paused and not self.cancelled:
+                self.idle += 1
+                self.flush_if_idle()
+                while self.paused and not self.cancelled:
+                    self.condition.wait()
+                self.idle -= 1
+            return not self.cancelled
+
+    def finish(self):
+        """
+        finish() records that one worker has no nodes left.
+
+        finish: () -> None
+        """
+        with self.condition:
+            self.workers -= 1
+            if self.paused:
+                self.flush_if_idle()
+
+    def flush_if_idle(self):
+        """
+        flush_if_idle() calls `on_idle` once per pause when every remaining worker is waiting.
+            Must be called with `condition` held.
+
+        flush_if_idle: () -> None
+        """
+        if self.idle == self.workers and not self.flushed and self.on_idle:
+            self.flushed = True
+            self.on_idle()
+
+
+scan_control = ScanControl()
+
+
+class ScanBudget:
+    """
+    ScanBudget bounds a priority scan by wall-clock time and by the number of HTTP requests
+    sent. Every probe, page fetch and link check that goes to the network spends one
+    request, whether or not a budget is set.
+
+    Instance Attributes:
+        - deadline (float): time.monotonic() value when time runs out, or None.
+        - limit (int): Number of requests allowed, or None.
+        - spent (int): Number of requests sent since reset.
+
+    ScanBudget: () -> ScanBudget
+
+    Example:
+        -> budget = ScanBudget()
+        -> budget.reset(3600, 20000)
+        -> budget.spend()
+        -> budget.exhausted()
+        False
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, seconds=None, requests_allowed=None):
+        """
+        reset([seconds][, requests_allowed]) starts a budget of seconds from now and
+            requests_allowed requests; None means no limit.
+
+        reset: [anyof(Float, None)] [anyof(Int, None)] -> None
+        """
+        with self.lock:
+            self.deadline = time.monotonic() + seconds if seconds else None
+            self.limit = requests_allowed
+            self.spent = 0
+
+    def spend(self):
+        """
+        spend() records one request.
+
+        spend: () -> None
+        """
+        with self.lock:
+            self.spent += 1
+
+    def exhausted(self):
+        """
+        exhausted() returns True once the time or the requests of the budget are used up.
+
+        exhausted: () -> Bool
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.limit is not None and self.spent >= self.limit
+
+
+scan_budget = ScanBudget()
+hedge_executor = ThreadPoolExecutor(max_workers=64)
+
+
+def hedged_head(session, url):
+    """
+    hedged_head(session, url) sends a HEAD request to url and, if it has not answered within
+        the HEDGE_PERCENTILE latency of recent link checks, sends a second identical request
+        and returns whichever response arrives first.
+
+    hedged_head: Session Str -> Response
+
+    Effects:
+        - Performs one or two HTTP HEAD requests and records the latency in `link_latency`.
+        - Raises the request error if every attempt fails.
+    """
+    start = time.monotonic()
+    delay = link_latency.percentile(HEDGE_PERCENTILE)
+    if delay is None:
+        response = session.head(url, allow_redirects=True, timeout=5)
+    else:
+        futures = {hedge_executor.submit(session.head, url, allow_redirects=True, timeout=5)}
+        done, futures = wait(futures, timeout=delay)
+        if not done:
+            futures.add(hedge_executor.submit(session.head, url, allow_redirects=True, timeout=5))
+        response = None
+        while response is None:
+            if not done:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            attempt = done.pop()
+            if attempt.exception() is None:
+                response = attempt.result()
+            elif not done and not futures:
+                raise attempt.exception()
+    link_latency.observe(time.monotonic() - start)
+    return response
 
 
 def check_url(session, url):
@@ -23,6 +443,10 @@ def check_url(session, url):
 
     Returns:
         - url (str) if any error occurs or the status code is not 200.
+        - url (str) immediately, without a request, if the breaker of its host is open.
+        - The cached outcome, without a request, if url was already checked in this run.
+        - The outcome of the probe, without a request, if url is a node of the running scan
+          that has been probed already.
         - None if the URL is successfully accessed and the status code is 200.
 
     check_url: Session Str -> anyof(Str, None)
@@ -36,96 +460,668 @@ def check_url(session, url):
         if faulty_url:
             print(f"The URL {faulty_url} is not accessible or caused an error.")
     """
-    try:
-        response = session.head(url, allow_redirects=True, timeout=5)
-        response_code = response.status_code
-        if response_code == 404:
-            return url
-    except requests.exceptions.RequestException as e:
-        print(f"Error checking URL {url}: {e}")
-        return url
-    return None
+    status = node_status.lookup(url)
+    if status is not None:
+        broken = status == 404
+        http_archive.record_link(url, broken)
+        return url if broken else None
+    cached = link_cache.lookup(url)
+    if cached is not None:
+        return url if cached else None
+    broken = True
+    unreachable = not host_breaker.allow(url)
+    if not unreachable:
+        try:
+            scan_budget.spend()
+            response = hedged_head(session, url)
+            host_breaker.record_success(url)
+            broken = response.status_code == 404
+            link_cache.record(url, broken)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            host_breaker.record_failure(url)
+            unreachable = not host_breaker.allow(url)
+            print(f"Error checking URL {url}: {e}")
+        except requests.exceptions.RequestException as e:
+            print(f"Error checking URL {url}: {e}")
+    http_archive.record_link(url, broken, unreachable)
+    return url if broken else None
+
+
+link_scheduler = HostScheduler(check_url)
+
+
+def submit_link(url):
+    """
+    submit_link(url) returns a Future of the outcome of check_url for url.
+
+    submit_link: Str -> Future
+
+    Note: A link to a node of the running scan is answered by the node's probe once it is
+          recorded, without holding a `link_scheduler` worker while it waits. If the probe
+          fails or never comes, the link is checked through `link_scheduler` after all.
+    """
+    probe = node_status.watch(url)
+    if probe is None:
+        return link_scheduler.submit(url)
+    result = Future()
+
+    def checked(future):
+        if future.cancelled():
+            result.cancel()
+        elif future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            result.set_result(future.result())
+
+    def probed(future):
+        status = None if future.cancelled() else future.result()
+        if status is None:
+            link_scheduler.submit(url).add_done_callback(checked)
+            return
+        broken = status == 404
+        http_archive.record_link(url, broken)
+        result.set_result(url if broken else None)
+
+    probe.add_done_callback(probed)
+    return result
+
+
+def parse_page(base_url, content, digest=None):
+    """
+    parse_page(base_url, content[, digest]) returns the URLs causing accessibility issues on
+        the page content fetched from base_url, and the URLs of the links that need checking.
+
+    parse_page: Str Bytes [Str] -> ((listof str), (listof str))
+
+    Requires:
+        - content is the HTML body of the page at base_url.
+        - digest, if given, is page_hash(content).
+
+    Effects:
+        - Once `site_template` has been learned, only the content regions of the page are
+          parsed and analysed; the shared template is reported once by learn_template.
+        - A body seen before is not parsed: its images and anchors come from
+          `analysis_cache`, and only the classification below is redone.
+
+    Example:
+        acc_problem, urls_to_check = parse_page('http://example.com', response.content)
+    """
+    key = f"{digest or page_hash(content)}:{site_template.signature}"
+    entry = analysis_cache.lookup(key)
+    if entry is None:
+        entry = extract_links(site_template.content_soup(content))
+        analysis_cache.store(key, *entry)
+    return classify_links(base_url, *entry)
+
+
+def analyze_soup(base_url, soup):
+    """
+    analyze_soup(base_url, soup) returns the URLs causing accessibility issues in soup, a
+        parsed page or part of a page from base_url, and the URLs of the links to check.
+
+    analyze_soup: Str anyof(BeautifulSoup, Tag) -> ((listof str), (listof str))
+    """
+    return classify_links(base_url, *extract_links(soup))
+
+
+def extract_links(soup):
+    """
+    extract_links(soup) returns the src of every image without alt text in soup, and the
+        href of every anchor with whether it has text, both as written in the page.
+
+    extract_links: anyof(BeautifulSoup, Tag) -> ((listof str), (listof (Str, Bool)))
+    """
+    images = [img.get('src') for img in soup.find_all('img')
+              if img.get('alt') is None or not img.get('alt').strip()]
+    anchors = [(a.get('href'), bool(a.get_text().strip())) for a in soup.find_all('a', href=True)]
+    return images, anchors
+
+
+def classify_links(base_url, images, anchors):
+    """
+    classify_links(base_url, images, anchors) returns the URLs causing accessibility issues
+        and the URLs of the links to check, from what extract_links found on a page from
+        base_url.
+
+    classify_links: Str (listof str) (listof (Str, Bool)) -> ((listof str), (listof str))
+
+    Note: The function internally uses `exclusion_list` and `social_media_domains`
+          which should be available in the scope.
+    """
+    acc_problem = []
+    urls_to_check = []
+    social_media_domains = load_config('social_media_domains.json')
+    exclusion_list = load_config('exclusion_list.json')
+    for img_url in images:
+        img_url = urljoin(base_url, img_url)
+        if img_url not in exclusion_list:
+            acc_problem.append(img_url)
+    for url, has_text in anchors:
+        if url.startswith('tel') or url.startswith('mailto') or any(
+                domain in url for domain in social_media_domains) or url.startswith('#'):
+            continue
+        if not has_text:
+            url = urljoin(base_url, url)
+            if "forward?path=node" in url:
+                continue
+            if url not in exclusion_list:
+                acc_problem.append(url)
+        url = urljoin(base_url, url)
+        urls_to_check.append(url)
+    return acc_problem, urls_to_check
+
+
+def check_links(urls_to_check):
+    """
+    check_links(urls_to_check) checks urls_to_check through submit_link and returns the
+        broken ones and the ones not resolved within NODE_BUDGET seconds. Links to nodes the
+        running scan has not reached yet are deferred without being checked.
+
+    check_links: (listof str) -> ((listof str), (listof str))
+
+    Effects:
+        - Performs HTTP requests through check_url, batched by host together with the
+          links of the other pages being checked. Checks not finished when the budget runs
+          out stay queued, and retry_deferred picks up their outcome.
+
+    Example:
+        broken_urls, deferred = check_links(['http://example.com'])
+    """
+    ahead = {url for url in urls_to_check if node_status.ahead(url)}
+    futures = {submit_link(url): url for url in urls_to_check if url not in ahead}
+    done, pending = wait(futures, timeout=NODE_BUDGET)
+    broken_urls = [url for future, url in futures.items() if future in done and future.result()]
+    unresolved = ahead | {futures[future] for future in pending}
+    deferred = [url for url in urls_to_check if url in unresolved]
+    return broken_urls, deferred
 
 
 def acc_check(base_url):
     """
     acc_check(base_url) returns a tuple of lists containing broken URLs and URLs causing
-    accessibility issues from the page located at base_url.
+    accessibility issues from the page located at base_url, plus the links whose check did
+    not finish within NODE_BUDGET seconds.
 
     Returns:
         - broken_urls ((listof str)): A list of strings, each representing a URL which is broken.
         - acc_problem ((listof str)): A list of strings, each representing a URL which causes
           accessibility issues.
+        - deferred ((listof str)): A list of strings, each representing a URL whose check is
+          still unresolved and should be retried by retry_deferred.
 
-    acc_check: Str -> ((listof str), (listof str))
+    acc_check: Str -> ((listof str), (listof str), (listof str))
 
     Requires:
         - base_url is a string representing a valid URL of the base page where
           the checking will be performed.
 
-        Note: The function internally uses `exclusion_list` and `social_media_domains`
-              which should be available in the scope.
+    Effects:
+        - Records the page and link outcomes if `http_archive` is recording.
 
     Example:
-        broken_urls, acc_problems = acc_check('http://example.com')
+        broken_urls, acc_problems, deferred = acc_check('http://example.com')
         if broken_urls:
             print(f"Broken URLs: {broken_urls}")
         if acc_problems:
             print(f"URLs causing accessibility issues: {acc_problems}")
     """
-    broken_urls = []
-    acc_problem = []
-    social_media_domains = load_config('social_media_domains.json')
-    exclusion_list = load_config('exclusion_list.json')
+    session = requests.Session()
+    content = fetch_page(session, base_url)
+    if content is None:
+        return [], [], []
+    acc_problem, urls_to_check = parse_page(base_url, content)
+    broken_urls, deferred = check_links(urls_to_check)
+    return broken_urls, acc_problem, deferred
+
+
+def fetch_page(session, base_url):
+    """
+    fetch_page(session, base_url) returns the body of the page at base_url, or None if it
+        could not be fetched.
+
+    fetch_page: Session Str -> anyof(Bytes, None)
+
+    Effects:
+        - Performs an HTTP GET request and records the page if `http_archive` is recording.
+    """
     try:
-        session = requests.Session()
+        scan_budget.spend()
         response = session.get(base_url)
+        http_archive.record_node(base_url, response.status_code, response.content)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        for img in soup.find_all('img'):
-            alt_text = img.get('alt')
-            if alt_text is None or not alt_text.strip():
-                img_url = img.get('src')
-                img_url = urljoin(base_url, img_url)
-                if img_url not in exclusion_list:
-                    acc_problem.append(img_url)
-        urls_to_check = []
-        for a in soup.find_all('a', href=True):
-            url = a.get('href')
-            text = a.get_text()
-            if url.startswith('tel') or url.startswith('mailto') or any(
-                    domain in url for domain in social_media_domains) or url.startswith('#'):
-                continue
-            if not text.strip():
-                url = urljoin(base_url, url)
-                if "forward?path=node" in url:
-                    continue
-                if url not in exclusion_list:
-                    acc_problem.append(url)
-            url = urljoin(base_url, url)
-            urls_to_check.append(url)
-        with ThreadPoolExecutor(max_workers=16) as executor:
-            results = executor.map(lambda url: check_url(session, url), urls_to_check)
-            broken_urls = [result for result in results if result]
+        return response.content
     except requests.exceptions.RequestException as e:
         print(f"Error fetching URLs from {base_url}: {e}")
-    return broken_urls, acc_problem
+    return None
+
+
+class NodeTask:
+    """
+    NodeTask carries one node through the stages of scan_nodes.
+
+    Instance Attributes:
+        - node (int): The node number.
+        - base_url (str): The URL of the node.
+        - live (bool): True if the node answered the probe with status 200.
+        - skipped (bool): True if the node was not probed because `scan_budget` ran out.
+        - session (Session): Session used to fetch the page of the node.
+        - content (bytes): The fetched page body, dropped once it has been parsed.
+        - acc_problem, urls_to_check, broken_urls, deferred ((listof str)): Results of the
+          parse and link-check stages.
+
+    NodeTask: Int Str -> NodeTask
+    """
+
+    def __init__(self, node, base_url):
+        self.node = node
+        self.base_url = base_url
+        self.live = False
+        self.skipped = False
+        self.session = None
+        self.content = None
+        self.acc_problem = []
+        self.urls_to_check = []
+        self.broken_urls = []
+        self.deferred = []
+
+
+def probe_node(task):
+    """
+    probe_node(task) sends a HEAD request to the node of task and marks it live on status 200.
+        The status and the URL the probe ended at are also recorded in `node_status` for
+        links to the node, and the Last-Modified time of a live page in `scan_state`. Once
+        `scan_budget` is used up, the node is skipped without a request and recorded with
+        no status, so links to it are checked on their own.
+
+    probe_node: NodeTask -> NodeTask
+    """
+    if scan_budget.exhausted():
+        task.skipped = True
+        node_status.record(task.node, None)
+        return task
+    print(f"Working on node {task.node}")
+    try:
+        scan_budget.spend()
+        response = requests.head(task.base_url, allow_redirects=True, timeout=5)
+    except requests.exceptions.RequestException as e:
+        print(f"Error probing {task.base_url}: {e}")
+        node_status.record(task.node, None)
+        return task
+    node_status.record(task.node, response.status_code, response.url)
+    task.live = response.status_code == 200
+    if not task.live:
+        http_archive.record_node(task.base_url, response.status_code)
+    elif 'Last-Modified' in response.headers:
+        try:
+            modified = parsedate_to_datetime(response.headers['Last-Modified'])
+            scan_state.set_modified(task.node, modified.timestamp())
+        except (TypeError, ValueError):
+            pass
+    return task
+
+
+def fetch_node(task):
+    """
+    fetch_node(task) fetches the page of a live node.
+
+    fetch_node: NodeTask -> NodeTask
+    """
+    if task.live:
+        task.session = requests.Session()
+        task.content = fetch_page(task.session, task.base_url)
+    return task
+
+
+def parse_node(task):
+    """
+    parse_node(task) parses the fetched page of task and drops the page body.
+
+    In a diff scan, a page whose hash matches the previous scan is not parsed: its previous
+    accessibility problems are kept and only its previously broken links are re-checked.
+
+    parse_node: NodeTask -> NodeTask
+    """
+    if task.content is not None:
+        digest = page_hash(task.content)
+        scan_state.set_hash(task.node, digest)
+        previous = scan_state.known(task.node) if scan_state.diff else None
+        if previous is not None and previous[0] == digest:
+            task.urls_to_check = previous[1]
+            task.acc_problem = previous[2]
+            scan_state.set_links(task.node, previous[4] if len(previous) > 4 else [])
+        else:
+            task.acc_problem, task.urls_to_check = parse_page(task.base_url, task.content, digest)
+            linked = (node_status.node_of(url) for url in task.urls_to_check)
+            scan_state.set_links(task.node, sorted({node for node in linked if node is not None}))
+        task.content = None
+    return task
 
 
-def range_check(app_instance, site, start_node, end_node, mode=0, output_name='', speed=0):
-    if speed == 1:
-        return range_check_fast(app_instance, site, start_node, end_node, mode, output_name)
+def check_node_links(task):
+    """
+    check_node_links(task) checks the links found on the page of task.
+
+    check_node_links: NodeTask -> NodeTask
+    """
+    if task.urls_to_check:
+        task.broken_urls, task.deferred = check_links(task.urls_to_check)
+    return task
+
+
+def scan_nodes(site, nodes, workers, on_complete, on_idle=None):
+    """
+    scan_nodes(site, nodes, workers, on_complete[, on_idle]) scans nodes of site through a
+        pipeline of stages, probe -> fetch -> parse -> links -> report, connected by bounded
+        queues, so that parsing on one node overlaps with network waits on others.
+
+    scan_nodes: Str (iterable of int) (dictof Str Int) (NodeTask -> None) [(() -> None)] -> None
+
+    Requires:
+        - workers gives the number of threads of the probe, fetch, parse and links stages.
+          The report stage always has one thread, so on_complete never runs concurrently.
+        - on_complete is called once for every node scanned, in the order the report stage
+          receives them; with one thread per stage that is the order of nodes.
+
+    Effects:
+        - Performs HTTP requests to the specified site and to every linked URL, except
+          links to nodes tracked by `node_status`, which are answered by their probe.
+        - Prints the queue metrics of every stage when the scan ends.
+    """
+    stages = [Stage('probe', probe_node, workers['probe'], PIPELINE_QUEUE_SIZE),
+              Stage('fetch', fetch_node, workers['fetch'], PIPELINE_QUEUE_SIZE),
+              Stage('parse', parse_node, workers['parse'], PIPELINE_QUEUE_SIZE),
+              Stage('links', check_node_links, workers['links'], PIPELINE_QUEUE_SIZE),
+              Stage('report', on_complete, 1, PIPELINE_QUEUE_SIZE)]
+    pipeline = Pipeline(stages, scan_control)
+    pipeline.run((NodeTask(node, site + f"node/{node}/") for node in node_status.track(nodes)), on_idle)
+    node_status.close()
+    pipeline.report()
+    link_scheduler.report()
+
+
+def report_node(task, deferred_nodes, mode=0, output_name=''):
+    """
+    report_node(task, deferred_nodes[, mode][, output_name]) reports the results of a scanned
+        node, or holds them in deferred_nodes if some of its link checks were deferred.
+
+    report_node: NodeTask (dictof Str ((listof str), (listof str), (listof str))) [Int] [Str] -> None
+    """
+    if not task.live:
+        previous = scan_state.known(task.node) if scan_state.diff else None
+        if previous is not None and (previous[1] or previous[2]):
+            # The page is gone, so everything found on it last time is fixed.
+            handle_results(task.base_url, [], [], mode, output_name)
+        return
+    if task.deferred:
+        deferred_nodes[task.base_url] = (task.broken_urls, task.acc_problem, task.deferred)
     else:
-        return range_check_slow(app_instance, site, start_node, end_node, mode, output_name)
+        handle_results(task.base_url, task.broken_urls, task.acc_problem, mode, output_name)
+
+
+def retry_deferred(deferred_nodes, mode=0, output_name='', run_deadline=None):
+    """
+    retry_deferred(deferred_nodes[, mode][, output_name][, run_deadline]) re-checks the links
+        that acc_check deferred and reports each held-back node with its complete results.
+
+    retry_deferred: (dictof Str ((listof str), (listof str), (listof str))) [Int] [Str]
+                    [anyof(Float, None)] -> None
+
+    Requires:
+        - deferred_nodes maps a base_url to the (broken_urls, acc_problem, deferred) tuple
+          returned by acc_check for that node.
+        - run_deadline is a time.monotonic() value, or None for no limit.
+
+    Effects:
+        - Performs HTTP requests for every deferred URL, without the per-node budget.
+        - Links still unresolved at run_deadline are reported as broken and marked
+          "unresolved".
+        - Reports every node through handle_results.
+    """
+    if not deferred_nodes:
+        return
+    urls = {url for _, _, deferred in deferred_nodes.values() for url in deferred}
+    print(f"Retrying {len(urls)} deferred links")
+    futures = {submit_link(url): url for url in urls}
+    timeout = None if run_deadline is None else max(0, run_deadline - time.monotonic())
+    done, pending = wait(futures, timeout=timeout)
+    broken = {futures[future] for future in done if future.result()}
+    unresolved = {futures[future] for future in pending}
+    for base_url, (broken_urls, acc_problem, deferred) in deferred_nodes.items():
+        broken_urls = broken_urls + [url for url in deferred if url in broken]
+        broken_urls += [url + UNRESOLVED_NOTE for url in deferred if url in unresolved]
+        handle_results(base_url, broken_urls, acc_problem, mode, output_name)
+
+
+def handle_results(base_url, broken_urls, acc_problem, mode=0, output_name='', kind='result'):
+    """
+    handle_results(base_url, broken_urls, acc_problem[, mode][, output_name][, kind]) reports
+        the problems found on base_url according to mode.
+
+    handle_results: Str (listof str) (listof str) [Int] [Str] [Str] -> None
+
+    Requires:
+        - 0 <= mode <= 3, with the same meaning as in range_check_slow.
+
+    Effects:
+        - Prints to the console if mode is 0, otherwise writes to the result file.
+        - Broken URLs on hosts whose breaker opened are marked as "host unreachable".
+        - Adds whatever is written for a node to `problem_index`.
+        - Stores the results of a node in `scan_state`, and in a diff scan reports the
+          difference with the previous scan.
+    """
+    node = node_number(base_url)
+    if node is not None and kind == 'result':
+        raw_urls = [url.replace(UNRESOLVED_NOTE, '') for url in broken_urls]
+        fixed, new, unchanged = scan_state.record(node, raw_urls, acc_problem)
+        if scan_state.diff and (fixed or new or unchanged):
+            if mode == 0:
+                print("Fixed:", fixed)
+                print("New:", new)
+                print("Unchanged:", unchanged)
+            else:
+                write_diff(output_name, base_url, fixed, new, unchanged)
+    broken_urls = [host_breaker.label(url) for url in broken_urls]
+    if mode == 1:
+        if broken_urls == [] and acc_problem != []:
+            write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 0, kind)
+            index_results(base_url, acc_problem, [])
+    elif mode == 2:
+        if broken_urls != [] and acc_problem == []:
+            write_to_file(output_name, base_url, acc_problem, broken_urls, 0, 1, kind)
+            index_results(base_url, [], broken_urls)
+    elif mode == 3:
+        if broken_urls != [] or acc_problem != []:
+            write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 1, kind)
+            index_results(base_url, acc_problem, broken_urls)
+    else:
+        print("Accessibility Problems:", acc_problem)
+        print("Broken URLs:", broken_urls)
+
+
+def index_results(base_url, acc_problem, broken_urls):
+    """
+    index_results(base_url, acc_problem, broken_urls) adds the problems reported for the node
+        at base_url to `problem_index`. Non-node URLs, such as the site-wide template, are
+        not indexed.
+
+    index_results: Str (listof str) (listof str) -> None
+    """
+    node = node_number(base_url)
+    if node is None:
+        return
+    for url in acc_problem:
+        problem_index.add('acc_problem', url, node)
+    for url in broken_urls:
+        problem_index.add('broken_url', url, node)
+
+
+def learn_template(pages, check, mode=0, output_name=''):
+    """
+    learn_template(pages, check[, mode][, output_name]) learns `site_template` from pages and
+        reports the problems in the shared template once, as site-wide findings.
+
+    learn_template: (listof (Str, Bytes)) ((listof str) -> (listof str)) [Int] [Str] -> None
+
+    Requires:
+        - pages is a list of (base_url, content) of sample node pages of one site.
+        - check returns the broken URLs among the URLs it is given.
+
+    Effects:
+        - Replaces today's "{output_name}sitewide_{time_str}.txt" if mode is 1, 2 or 3.
+    """
+    site_template.reset()
+    if len(pages) < 2 or not site_template.learn(pages):
+        return
+    base_url = pages[0][0]
+    acc_problem = []
+    urls_to_check = []
+    for element in site_template.chrome_elements:
+        # Re-parsed on its own so that a region which is itself an <a> or <img> is found.
+        element_acc, element_urls = analyze_soup(base_url, BeautifulSoup(str(element), 'html.parser'))
+        acc_problem += element_acc
+        urls_to_check += element_urls
+    print(f"Learned the site template from {len(pages)} pages, "
+          f"{len(site_template.chrome_elements)} shared regions are checked once")
+    result_path(output_name, 'sitewide').unlink(missing_ok=True)
+    site = base_url.split('node/')[0] + " (site-wide template)"
+    handle_results(site, check(urls_to_check), acc_problem, mode, output_name, 'sitewide')
+
+
+def sample_pages(site, nodes):
+    """
+    sample_pages(site, nodes) fetches the first TEMPLATE_SAMPLES live pages among nodes,
+        trying at most ten times as many nodes.
+
+    sample_pages: Str (iterable of int) -> (listof (Str, Bytes))
+
+    Effects:
+        - Every request is counted in `scan_budget` and every page is recorded by
+          `http_archive` if it is recording, so a replay learns from the same pages.
+    """
+    session = requests.Session()
+    pages = []
+    for node in islice(nodes, TEMPLATE_SAMPLES * 10):
+        base_url = site + f"node/{node}/"
+        try:
+            scan_budget.spend()
+            response = session.get(base_url, timeout=5)
+        except requests.exceptions.RequestException:
+            continue
+        http_archive.record_node(base_url, response.status_code,
+                                 response.content if response.status_code == 200 else None)
+        if response.status_code == 200:
+            pages.append((base_url, response.content))
+        if len(pages) >= TEMPLATE_SAMPLES:
+            break
+    return pages
+
+
+def range_check(app_instance, site, start_node, end_node, mode=0, output_name='', speed=0, record=False,
+                discovery=None, diff=False, timebox=None):
+    host_breaker.reset()
+    link_cache.reset()
+    link_scheduler.reset()
+    node_status.reset()
+    analysis_cache.load()
+    problem_index.reset()
+    problem_index.load()
+    scan_state.reset()
+    found = scan_state.load(output_name)
+    scan_state.diff = diff and found
+    if diff and not found:
+        print("No previous scan of this site was found, running a full scan")
+    scan_budget.reset(timebox * 60 if timebox else None, PRIORITY_REQUEST_BUDGET if timebox else None)
+    deadlines = [deadline for deadline in (time.monotonic() + RUN_BUDGET if RUN_BUDGET else None,
+                                           scan_budget.deadline) if deadline is not None]
+    run_deadline = min(deadlines) if deadlines else None
+
+    def check(urls):
+        broken_urls, deferred = check_links(urls)
+        return broken_urls + [url + UNRESOLVED_NOTE for url in deferred]
+
+    if record:
+        # Only a resumed run extends the archive; a new run replaces one recorded earlier today.
+        http_archive.start(archive_path(output_name), resume=Path('progress.txt').exists())
+    try:
+        # Recording starts first so the template's pages and link checks are replayable.
+        candidates = discovery.nodes() if discovery is not None else range(start_node, end_node)
+        learn_template(sample_pages(site, candidates), check, mode, output_name)
+        if speed == 1 or timebox:
+            return range_check_fast(app_instance, site, start_node, end_node, mode, output_name,
+                                    run_deadline=run_deadline, discovery=discovery, priority=bool(timebox))
+        else:
+            return range_check_slow(app_instance, site, start_node, end_node, mode, output_name,
+                                    run_deadline=run_deadline, discovery=discovery)
+    finally:
+        link_scheduler.reset()
+        http_archive.stop()
+        print(f"Analysis cache: {analysis_cache.hits} pages reused, {analysis_cache.misses} parsed")
+        analysis_cache.save()
+        scan_state.save(output_name)
+        scan_state.diff = False
+
+
+def replay_check(app_instance, path, mode=0, output_name=''):
+    """
+    replay_check(app_instance, path[, mode][, output_name]) re-runs the accessibility and
+        broken-link analysis of a recorded scan against its HTTP archive, without any
+        network access.
+
+    replay_check: SiteCheckerApp Path [Int] [Str] -> None
+
+    Requires:
+        - path is an archive written by a recording run (see HttpArchive).
+        - 0 <= mode <= 3, with the same meaning as in range_check_slow.
+
+    Effects:
+        - Reports every recorded node through handle_results, using the current
+          exclusion_list.json and social_media_domains.json.
+        - Links that were never resolved in the recording are reported as "unresolved".
+
+    Example:
+        replay_check(app, archive_path('mme_'), 3, 'mme_replay_')
+    """
+    app_instance.output_text.delete('1.0', tk.END)
+    host_breaker.reset()
+    node_status.reset()
+    problem_index.reset()
+    scan_state.reset()
+    links, unreachable, nodes = read_archive(path)
+    host_breaker.tripped.update(urlsplit(url).netloc for url in unreachable)
+
+    def check(urls):
+        broken_urls = [url for url in urls if links.get(url)]
+        return broken_urls + [url + UNRESOLVED_NOTE for url in urls if url not in links]
+
+    pages = ((url, content) for url, status, content in read_nodes(path) if status == 200 and content is not None)
+    learn_template(list(islice(pages, TEMPLATE_SAMPLES)), check, mode, output_name)
+    seen = set()
+    count = 0
+    for base_url, status, content in nodes:
+        if base_url in seen:
+            continue
+        seen.add(base_url)
+        if status == 200 and content is not None:
+            acc_problem, urls_to_check = parse_page(base_url, content)
+            handle_results(base_url, check(urls_to_check), acc_problem, mode, output_name)
+        count += 1
+        app_instance.progress_var.set(count)
+        app_instance.update_progress_label()
+    print(f"Replayed {count} nodes from {path}")
+    app_instance.update_progress_label(1)
+    if mode != 0:
+        parse_and_sort(output_name)
+        problem_index.write(output_name)
     
 
-def range_check_slow(app_instance, site, start_node, end_node, mode=0, output_name=''):
+def range_check_slow(app_instance, site, start_node, end_node, mode=0, output_name='', run_deadline=None,
+                     discovery=None):
     """
-    range_check(site, start_node, end_node[, mode][, output_name]) iterates through a range
-        of nodes on a website, checking for broken URLs and accessibility problems on each one,
-        and optionally writes issues to a file.
+    range_check(site, start_node, end_node[, mode][, output_name][, run_deadline][, discovery])
+        iterates through a range of nodes on a website, checking for broken URLs and
+        accessibility problems on each one, and optionally writes issues to a file.
 
-    range_check: Str Int Int Int Str -> None
+    range_check: Str Int Int Int Str anyof(Float, None) anyof(NodeDiscovery, None) -> None
 
     Requires:
         - site is a non-empty string, representing the base URL of the website to check.
@@ -136,10 +1132,19 @@ def range_check_slow(app_instance, site, start_node, end_node, mode=0, output_na
             2: write only broken URLs to file
             3: write all problems to file
         - output_name is an optional string to prefix the result filename with.
+        - run_deadline is the time.monotonic() value by which deferred link checks must be
+          resolved, or None for no limit.
+        - discovery, if given, is the result of discover_nodes for the same range; only the
+          nodes it finds promising are scanned.
 
     Effects:
         - Performs HTTP requests to the specified site.
         - Writes to a file if mode is 1, 2, or 3, and issues are found.
+        - Saves the progress and `problem_index` every CHECKPOINT_INTERVAL nodes, on pause
+          and on cancel, so an interrupted scan resumes from the last checkpoint.
+        - Nodes with link checks that exceed NODE_BUDGET are reported after the retry pass;
+          until then the saved progress stays before them, so a resumed scan redoes them.
+        - Scans through scan_nodes with one thread per stage, so nodes complete in order.
 
     Examples:
         range_check("http://example.com/", 1, 100, 1, "example_")
@@ -151,34 +1156,67 @@ def range_check_slow(app_instance, site, start_node, end_node, mode=0, output_na
         a = last_node + 1
     else:
         a = start_node
-    site_url = site
-    for i in range(a, end_node):
-        print(f"Working on node {i}")
-        base_url = site_url + f"node/{i}/"
-        response = requests.head(base_url, allow_redirects=True, timeout=5)
-        if response.status_code == 200:
-            broken_urls, acc_problem = acc_check(base_url)
-            if mode == 1:
-                if broken_urls == [] and acc_problem != []:
-                    write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 0)
-            elif mode == 2:
-                if broken_urls != [] and acc_problem == []:
-                    write_to_file(output_name, base_url, acc_problem, broken_urls, 0, 1)
-            elif mode == 3:
-                if broken_urls != [] or acc_problem != []:
-                    write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 1)
-            else:
-                print("Accessibility Problems:", acc_problem)
-                print("Broken URLs:", broken_urls)
-        app_instance.progress_var.set(i - start_node + 1)
+    deferred_nodes = {}
+    reached = done = a - 1
+    unsaved = 0
+
+    def checkpoint():
+        nonlocal unsaved
+        set_last_node(app_instance, done)
+        problem_index.save()
+        unsaved = 0
+
+    def complete(task):
+        nonlocal reached, done, unsaved
+        report_node(task, deferred_nodes, mode, output_name)
+        app_instance.progress_var.set(task.node - start_node + 1)
         app_instance.update_progress_label()
         app_instance.progressbar.update_idletasks()
-        set_last_node(app_instance, i)
+        # Resume before the first node held for the retry pass, so it is redone if the scan
+        # stops before it is reported. Nodes complete in order, so it is the first one held.
+        reached = task.node
+        done = node_number(next(iter(deferred_nodes))) - 1 if deferred_nodes else task.node
+        unsaved += 1
+        if unsaved >= CHECKPOINT_INTERVAL:
+            checkpoint()
+
+    if discovery is not None:
+        nodes = (node for node in discovery.nodes() if node >= a)
+    else:
+        nodes = range(a, end_node)
+    node_status.reset(site, lambda node: a <= node < end_node and (discovery is None or discovery.covers(node)))
+    scan_nodes(site, nodes, SLOW_PIPELINE_WORKERS, complete, on_idle=checkpoint)
+    retry_deferred(deferred_nodes, mode, output_name, run_deadline)
+    if scan_control.cancelled:
+        # retry_deferred has reported the held nodes, so every node reached is done.
+        done = reached
+        checkpoint()
+        print("Scan cancelled, progress saved")
+        return
     app_instance.update_progress_label(1)
+    problem_index.write(output_name)
     remove_progress()
 
 
-def range_check_fast(app_instance, site, start_node, end_node, mode=0, output_name='', num_threads=10):
+def range_check_fast(app_instance, site, start_node, end_node, mode=0, output_name='', workers=PIPELINE_WORKERS,
+                     run_deadline=None, discovery=None, priority=False):
+    """
+    range_check_fast(app_instance, site, start_node, end_node[, mode][, output_name][, workers]
+        [, run_deadline][, discovery][, priority]) checks the nodes of site in
+        [start_node, end_node) with several workers per pipeline stage, the same way as
+        range_check_slow.
+
+    range_check_fast: App Str Int Int [Int] [Str] [(dictof Str Int)] [anyof(Float, None)]
+                      [anyof(NodeDiscovery, None)] [Bool] -> None
+
+    Effects:
+        - Checkpoints the finished nodes to progress.bin every CHECKPOINT_INTERVAL nodes, on
+          pause and on cancel, so an interrupted scan resumes where it stopped.
+        - With priority, nodes are checked most important first (see rank_nodes) until
+          `scan_budget` is used up. The nodes already fed to the pipeline are finished, a
+          partial report is written and the rest, including those still waiting on deferred
+          link checks, are left in the checkpoint for the next run.
+    """
     app_instance.output_text.delete('1.0', tk.END)
     last_node = get_last_node(app_instance)
     app_instance.progressbar['maximum'] = end_node - start_node
@@ -187,65 +1225,118 @@ def range_check_fast(app_instance, site, start_node, end_node, mode=0, output_na
     else:
         finish = 0
     bits_map = load_bin(end_node + 1)
-    def worker(start, end):
-        for i in range(start, end):
-            if not bits_map[i]:
-                process_node(i)
-
-    def process_node(node):
-        nonlocal finish
-        print(f"Working on node {node}\n")
-        base_url = site + f"node/{node}/"
-        response = requests.head(base_url, allow_redirects=True, timeout=5)
-        if response.status_code == 200:
-            broken_urls, acc_problem = acc_check(base_url)
-            handle_results(broken_urls, acc_problem, base_url)
-        bits_map[node] = 1
-        save_bin(bits_map)
-        finish += 1
-        set_last_node(app_instance, finish)
+    deferred_nodes = {}
+    lock = threading.Lock()
+    unsaved = 0
+
+    def checkpoint():
+        nonlocal unsaved
+        with lock:
+            save_bin(bits_map)
+            set_last_node(app_instance, finish)
+            problem_index.save()
+            unsaved = 0
+
+    def complete(task):
+        nonlocal finish, unsaved
+        if task.skipped:
+            heapq.heappush(queue, (-node_priority(scan_state.known(task.node), 0, time.time()), -task.node))
+            return
+        report_node(task, deferred_nodes, mode, output_name)
+        with lock:
+            # Nodes waiting on deferred checks stay unmarked so a cancelled run redoes them.
+            if task.base_url not in deferred_nodes:
+                bits_map[task.node] = 1
+            finish += 1
+            unsaved += 1
+            due = unsaved >= CHECKPOINT_INTERVAL
+        if due:
+            checkpoint()
         app_instance.progress_var.set(finish)
         app_instance.update_progress_label()
         app_instance.progressbar.update_idletasks()
 
-    def handle_results(broken_urls, acc_problem, base_url):
-        if mode == 1:
-            if broken_urls == [] and acc_problem != []:
-                write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 0)
-        elif mode == 2:
-            if broken_urls != [] and acc_problem == []:
-                write_to_file(output_name, base_url, acc_problem, broken_urls, 0, 1)
-        elif mode == 3:
-            if broken_urls != [] or acc_problem != []:
-                write_to_file(output_name, base_url, acc_problem, broken_urls, 1, 1)
-        else:
-            print("Accessibility Problems:", acc_problem)
-            print("Broken URLs:", broken_urls)
-
-    # Divide the range into segments for each thread
-    total_nodes = end_node - start_node
-    nodes_per_thread = total_nodes // num_threads
-    threads = []
-
-    for i in range(num_threads):
-        start = start_node + i * nodes_per_thread
-        end = start_node + (i + 1) * nodes_per_thread if i != num_threads - 1 else end_node
-        thread = threading.Thread(target=worker, args=(start, end))
-        threads.append(thread)
-        thread.start()
+    candidates = discovery.nodes() if discovery is not None else range(start_node, end_node)
+    nodes = (i for i in candidates if not bits_map[i])
+    queue = []
+    if priority:
+        queue = rank_nodes(nodes)
+        print(f"Priority scan of {len(queue)} nodes, most important first")
 
-    # Wait for all threads to finish
-    for thread in threads:
-        thread.join()
+        def ranked():
+            while queue and not scan_budget.exhausted():
+                yield -heapq.heappop(queue)[1]
 
+        nodes = ranked()
+    # A priority scan may stop before it reaches a linked node, so it does not hold such links.
+    node_status.reset(site, lambda node: start_node <= node < end_node and not bits_map[node]
+                      and (discovery is None or discovery.covers(node)), hold_ahead=not priority)
+    scan_nodes(site, nodes, workers, complete, on_idle=checkpoint)
+
+    if scan_control.cancelled:
+        checkpoint()
+        print("Scan cancelled, progress saved")
+        return
+    if queue or (priority and deferred_nodes and scan_budget.exhausted()):
+        # Nodes waiting on deferred checks stay unmarked and unreported, so the next run
+        # redoes them instead of reporting their links as unresolved.
+        checkpoint()
+        if mode != 0:
+            parse_and_sort(output_name)
+            problem_index.write(output_name)
+        print(f"Budget used up after {scan_budget.spent} requests, "
+              f"{len(queue) + len(deferred_nodes)} nodes left for the next run, progress saved")
+        return
+    retry_deferred(deferred_nodes, mode, output_name, run_deadline)
     print(f"finish {sum(bits_map)}")
     app_instance.update_progress_label(1)
     if mode != 0:
         parse_and_sort(output_name)
+        problem_index.write(output_name)
     remove_progress()
 
 
-def node_check(app_instance, site, n, mode=0, output_name=''):
+def node_priority(entry, inlinks, now):
+    """
+    node_priority(entry, inlinks, now) returns how important it is to check a node whose
+        entry in `scan_state` is entry and which inlinks pages link to, at time now.
+
+    node_priority: anyof(List, None) Int Float -> Float
+
+    Note: A node is worth PRIORITY_PROBLEM_WEIGHT per problem found on it last time,
+          PRIORITY_LINK_WEIGHT per page linking to it, and up to PRIORITY_CHANGE_WEIGHT if
+          its page changed within PRIORITY_RECENT_DAYS, less the older the change.
+    """
+    score = inlinks * PRIORITY_LINK_WEIGHT
+    if entry is None:
+        return score
+    score += (len(entry[1]) + len(entry[2])) * PRIORITY_PROBLEM_WEIGHT
+    if len(entry) > 3 and entry[3] is not None:
+        age = (now - entry[3]) / 86400
+        if age < PRIORITY_RECENT_DAYS:
+            score += PRIORITY_CHANGE_WEIGHT * (1 - age / PRIORITY_RECENT_DAYS)
+    return score
+
+
+def rank_nodes(nodes):
+    """
+    rank_nodes(nodes) returns nodes as a heap of (-priority, -node), so that popping it gives
+        the most important node first and, among equals, the newest (highest) node.
+
+    rank_nodes: (iterable of int) -> (listof (Float, Int))
+
+    Example:
+        queue = rank_nodes(range(1, 1000))
+        node = -heapq.heappop(queue)[1]
+    """
+    inlinks = scan_state.inlinks()
+    now = time.time()
+    queue = [(-node_priority(scan_state.known(node), inlinks.get(node, 0), now), -node) for node in nodes]
+    heapq.heapify(queue)
+    return queue
+
+
+def node_check(app_instance, site, n, mode=0, output_name='', record=False, diff=False):
     """
     node_check(site, n[, mode][, output_name]) checks a single node on a website for broken URLs
         and accessibility problems and optionally writes issues to a file by utilizing range_check.
@@ -270,7 +1361,7 @@ def node_check(app_instance, site, n, mode=0, output_name=''):
         range_check("http://example.com/", 1, 100, 1, "example_")
     """
     b = n + 1
-    return range_check(app_instance, site, n, b, mode, output_name)
+    return range_check(app_instance, site, n, b, mode, output_name, record=record, diff=diff)
 
 
 def site_check(site):
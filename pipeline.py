@@ -0,0 +1,190 @@
+## =======================================================
+## Program: Site Checker (pipeline) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+import queue
+import threading
+
+
+STOP = object()
+POLL_INTERVAL = 0.2
+
+
+class Stage:
+    """
+    Stage is one step of a Pipeline: a function run by a fixed number of worker threads,
+    fed by a bounded input queue.
+
+    Instance Attributes:
+        - name (str): Name used in the metrics.
+        - function (Any -> Any): Applied to every item; its result goes to the next stage.
+        - workers (int): Number of threads running this stage.
+        - inbox (queue.Queue): Bounded queue of items waiting for this stage.
+        - processed (int): Number of items this stage has finished.
+        - busy (int): Number of workers currently running `function`.
+        - max_depth (int): Largest inbox depth seen so far.
+
+    Stage: Str (Any -> Any) Int Int -> Stage
+
+    Example:
+        -> Stage('parse', parse_task, 2, 20)
+    """
+
+    def __init__(self, name, function, workers, queue_size):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.running = 0
+
+
+class Pipeline:
+    """
+    Pipeline runs items from a source through a list of Stages connected by bounded queues,
+    so that the stages work on different items at the same time. A full queue blocks the
+    stage in front of it, which bounds the number of items in memory.
+
+    Every thread calls ScanControl.wait() between items, so the pipeline can be paused and
+    cancelled; an item held by a paused thread stays where it is until resume.
+
+    Instance Attributes:
+        - stages (listof Stage): The stages, in order.
+        - control (ScanControl): Pause and cancel control shared with the GUI.
+
+    Pipeline: (listof Stage) ScanControl -> Pipeline
+
+    Example:
+        -> pipeline = Pipeline([Stage('double', lambda x: 2 * x, 2, 10),
+        ->                      Stage('show', print, 1, 10)], scan_control)
+        -> pipeline.run(range(100))
+    """
+
+    def __init__(self, stages, control):
+        self.stages = stages
+        self.control = control
+
+    def put(self, stage, item):
+        """
+        put(stage, item) queues item for stage, waiting while the queue is full.
+
+        put: Stage Any -> Bool
+
+        Returns:
+            - False if the scan was cancelled before item could be queued, otherwise True.
+        """
+        while self.control.wait():
+            try:
+                stage.inbox.put(item, timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            with stage.lock:
+                stage.max_depth = max(stage.max_depth, stage.inbox.qsize())
+            return True
+        return False
+
+    def feed(self, source):
+        """
+        feed(source) queues every item of source for the first stage, then stops its workers.
+
+        feed: Iterable -> None
+        """
+        first = self.stages[0]
+        for item in source:
+            if not self.put(first, item):
+                break
+        else:
+            for _ in range(first.workers):
+                self.put(first, STOP)
+        self.control.finish()
+
+    def work(self, index):
+        """
+        work(index) runs items through stage index until it is stopped or cancelled. The last
+            worker of a stage to stop also stops the next stage.
+
+        work: Int -> None
+        """
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        stopped = False
+        while self.control.wait():
+            try:
+                item = stage.inbox.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is STOP:
+                stopped = True
+                break
+            with stage.lock:
+                stage.busy += 1
+            try:
+                result = stage.function(item)
+            except Exception as e:
+                print(f"Error in {stage.name} stage: {e}")
+                result = None
+            with stage.lock:
+                stage.busy -= 1
+                stage.processed += 1
+            if following is not None and result is not None and not self.put(following, result):
+                break
+        with stage.lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if stopped and last and following is not None:
+            for _ in range(following.workers):
+                self.put(following, STOP)
+        self.control.finish()
+
+    def run(self, source, on_idle=None):
+        """
+        run(source[, on_idle]) runs every item of source through the pipeline and returns
+            when all of them are done or the scan is cancelled.
+
+        run: Iterable [(() -> None)] -> None
+
+        Effects:
+            - Starts `control` for all pipeline threads; on_idle is called once whenever
+              every thread is parked on a pause.
+        """
+        threads = [threading.Thread(target=self.feed, args=(source,))]
+        for index, stage in enumerate(self.stages):
+            stage.running = stage.workers
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self.work, args=(index,)))
+        self.control.start(len(threads), on_idle=on_idle)
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def metrics(self):
+        """
+        metrics() returns the current queue depth, peak queue depth, busy workers and number
+            of processed items of every stage.
+
+        metrics: () -> (listof Dict)
+        """
+        return [{'stage': stage.name, 'workers': stage.workers, 'busy': stage.busy,
+                 'depth': stage.inbox.qsize(), 'max_depth': stage.max_depth,
+                 'capacity': stage.inbox.maxsize, 'processed': stage.processed}
+                for stage in self.stages]
+
+    def report(self):
+        """
+        report() prints one line of metrics per stage.
+
+        report: () -> None
+        """
+        for m in self.metrics():
+            print(f"{m['stage']}: {m['processed']} done by {m['workers']} workers, "
+                  f"queue {m['depth']}/{m['capacity']} (peak {m['max_depth']})")
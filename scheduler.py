@@ -0,0 +1,175 @@
+## =======================================================
+## Program: Site Checker (scheduler) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+from collections import deque
+from concurrent.futures import Future
+import math
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+HOST_WORKERS = 32
+HOST_CONCURRENCY = 4
+HOST_BATCH = 16
+HOST_DELAY = 0.0
+
+
+class HostScheduler:
+    """
+    HostScheduler runs URL checks from every page of a scan grouped by host, so that checks
+    to one host follow each other over the same warm keep-alive connections instead of
+    being interleaved with unrelated hosts in page order.
+
+    Every host has its own queue and its own Session, whose connection pool holds
+    HOST_CONCURRENCY connections. A worker takes a host with waiting URLs and checks a
+    batch of them in a row before handing the host back, so one busy host cannot starve
+    the others. A batch is the host's waiting URLs split over its free worker slots, at
+    most HOST_BATCH. At most HOST_CONCURRENCY workers serve one host at a time, and each
+    waits HOST_DELAY seconds between its requests to that host.
+
+    A URL submitted again while its check is still waiting or running shares that check.
+
+    Instance Attributes:
+        - check (Session Str -> Any): Checks one URL; its result completes the future.
+        - queues (dict): host -> deque of URLs waiting to be checked.
+        - sessions (dict): host -> Session used for that host.
+        - active (dict): host -> number of workers serving it.
+        - ready (deque): Hosts with waiting URLs and a free worker slot, in turn order.
+        - futures (dict): URL -> Future of its waiting or running check.
+        - checks, batches (int): Number of URLs checked and batches run since reset.
+        - generation (int): Incremented by reset, so batches started before it are not
+          counted against the new per-host limits.
+
+    HostScheduler: (Session Str -> Any) [Int] -> HostScheduler
+
+    Example:
+        -> scheduler = HostScheduler(check_url)
+        -> future = scheduler.submit('http://example.com/about')
+        -> broken = future.result()
+    """
+
+    def __init__(self, check, workers=HOST_WORKERS):
+        self.check = check
+        self.workers = workers
+        self.condition = threading.Condition()
+        self.threads = []
+        self.futures = {}
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        """
+        reset() cancels every waiting check and drops the per-host sessions and counters.
+
+        reset: () -> None
+        """
+        with self.condition:
+            for future in self.futures.values():
+                future.cancel()
+            self.generation += 1
+            self.queues = {}
+            self.sessions = {}
+            self.active = {}
+            self.ready = deque()
+            self.futures = {}
+            self.checks = 0
+            self.batches = 0
+
+    def session(self, host):
+        """
+        session(host) returns the Session of host, creating it on first use.
+            Must be called with `condition` held.
+
+        session: Str -> Session
+        """
+        if host not in self.sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HOST_CONCURRENCY)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.sessions[host] = session
+        return self.sessions[host]
+
+    def submit(self, url):
+        """
+        submit(url) queues url for checking and returns a Future of the result of `check`.
+
+        submit: Str -> Future
+        """
+        with self.condition:
+            if not self.threads:
+                for _ in range(self.workers):
+                    thread = threading.Thread(target=self.work, daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+            if url in self.futures:
+                return self.futures[url]
+            future = Future()
+            self.futures[url] = future
+            host = urlsplit(url).netloc
+            queue = self.queues.setdefault(host, deque())
+            queue.append(url)
+            if self.active.get(host, 0) < HOST_CONCURRENCY and host not in self.ready:
+                self.ready.append(host)
+                self.condition.notify()
+            return future
+
+    def work(self):
+        """
+        work() serves hosts from `ready` forever, one batch at a time.
+
+        work: () -> None
+        """
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                host = self.ready.popleft()
+                queue = self.queues[host]
+                free = HOST_CONCURRENCY - self.active.get(host, 0)
+                size = min(HOST_BATCH, math.ceil(len(queue) / free))
+                batch = [(url, self.futures[url]) for url in (queue.popleft() for _ in range(size))]
+                self.active[host] = self.active.get(host, 0) + 1
+                if queue and self.active[host] < HOST_CONCURRENCY:
+                    self.ready.append(host)
+                    self.condition.notify()
+                session = self.session(host)
+                generation = self.generation
+                self.batches += 1
+            for index, (url, future) in enumerate(batch):
+                if index and HOST_DELAY:
+                    time.sleep(HOST_DELAY)
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self.check(session, url))
+                except Exception as e:
+                    future.set_exception(e)
+                with self.condition:
+                    if self.futures.get(url) is future:
+                        del self.futures[url]
+                    self.checks += 1
+            with self.condition:
+                if generation != self.generation:
+                    continue
+                self.active[host] -= 1
+                if self.queues[host] and host not in self.ready:
+                    self.ready.append(host)
+                    self.condition.notify()
+
+    def report(self):
+        """
+        report() prints how many URLs were checked, over how many hosts and batches.
+
+        report: () -> None
+        """
+        print(f"Link checks: {self.checks} over {len(self.sessions)} hosts in {self.batches} batches")
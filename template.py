@@ -0,0 +1,212 @@
+## =======================================================
+## Program: Site Checker (template) - WCMS
+## Author: Le Zhang (20916452)
+## Email: l652zhan@uwaterloo.ca
+## Update Time: Oct. 19 2026
+## Company: University of Waterloo
+## Faculty: MECHANICAL AND MECHATRONICS ENGINEERING
+## =======================================================
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+import hashlib
+
+
+TEMPLATE_SAMPLES = 3
+TEMPLATE_DEPTH = 8
+
+
+def element_children(element):
+    """
+    element_children(element) returns the child tags of element, skipping text and comments.
+
+    element_children: Tag -> (listof Tag)
+    """
+    return [child for child in element.children if isinstance(child, Tag)]
+
+
+def element_hash(element):
+    """
+    element_hash(element) returns a digest of the serialized HTML of element.
+
+    element_hash: Tag -> Str
+    """
+    return hashlib.sha1(str(element).encode('utf-8')).hexdigest()
+
+
+def find_path(soup, path):
+    """
+    find_path(soup, path) returns the tag reached from <body> by following path, a sequence
+        of child-tag indexes, or None if the page does not have that shape.
+
+    find_path: BeautifulSoup (listof int) -> anyof(Tag, None)
+    """
+    element = soup.body
+    for index in path:
+        if element is None:
+            return None
+        children = element_children(element)
+        element = children[index] if index < len(children) else None
+    return element
+
+
+class SiteTemplate:
+    """
+    SiteTemplate learns which regions of a site's pages (header, navigation, footer, ...) are
+    identical on every page, so they can be analysed once for the whole site.
+
+    Learning walks the <body> of a few sample pages side by side. A region whose HTML is the
+    same on every sample is chrome; a region that differs is descended into while the
+    samples still share its structure. The largest differing regions that hold no chrome
+    are the content.
+
+    Later pages are then parsed with a SoupStrainer that only builds the content and chrome
+    regions, when all of them can be addressed by id or by a tag that occurs once per page
+    (such as <main> or <header>). Otherwise the full page is parsed. Either way the chrome
+    regions are removed before analysis only if they still match the learned ones; a page
+    whose chrome differs, or that lacks the learned regions, is analysed in full.
+
+    Instance Attributes:
+        - learned (bool): True once a template has been learned.
+        - chrome (listof (listof int)): Paths from <body> to the chrome regions.
+        - chrome_elements (listof Tag): The chrome regions of the first sample page.
+        - chrome_hashes (listof str): Digests of chrome_elements.
+        - strainer (SoupStrainer): Selects the content and chrome regions, or None.
+        - keys (dict): 'content' and 'chrome' -> the id or tag name of each region, in the
+          order of their paths, and 'by' -> 'id' or 'name', if `strainer` is set.
+        - signature (str): Digest of the learned chrome, '' if none, so that results of
+          analysing content regions can be told apart between templates.
+
+    SiteTemplate: () -> SiteTemplate
+
+    Example:
+        -> template = SiteTemplate()
+        -> template.learn([(url, content) for url, content in samples])
+        -> soup = template.content_soup(page_content)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        reset() forgets the learned template.
+
+        reset: () -> None
+        """
+        self.learned = False
+        self.chrome = []
+        self.chrome_elements = []
+        self.chrome_hashes = []
+        self.strainer = None
+        self.keys = {}
+        self.signature = ''
+
+    def learn(self, pages):
+        """
+        learn(pages) learns the template from pages, a list of (url, content) pairs of at
+            least two pages of the same site.
+
+        learn: (listof (Str, Bytes)) -> Bool
+
+        Returns:
+            - True if some chrome regions were found, otherwise False.
+        """
+        self.reset()
+        soups = [BeautifulSoup(content, 'html.parser') for _, content in pages]
+        if len(soups) < 2 or any(soup.body is None for soup in soups):
+            return False
+        content = []
+        self.walk([soup.body for soup in soups], [], content)
+        if not self.chrome:
+            return False
+        self.chrome_elements = [find_path(soups[0], path) for path in self.chrome]
+        self.chrome_hashes = [element_hash(element) for element in self.chrome_elements]
+        self.strainer = self.region_strainer(soups, content)
+        self.signature = hashlib.sha1(' '.join(self.chrome_hashes).encode('utf-8')).hexdigest()
+        self.learned = True
+        return True
+
+    def walk(self, elements, path, content):
+        """
+        walk(elements, path, content) classifies the differing tags at path on every sample
+            page, adding chrome paths below them to `chrome` and content paths to content.
+
+        walk: (listof Tag) (listof int) (listof (listof int)) -> Bool
+
+        Returns:
+            - True if some chrome was found below path, otherwise False, in which case
+              path itself is content.
+        """
+        children = [element_children(element) for element in elements]
+        shapes = {tuple(child.name for child in kids) for kids in children}
+        if len(shapes) != 1 or len(path) >= TEMPLATE_DEPTH:
+            content.append(path)
+            return False
+        found = False
+        inner = []
+        for index, kids in enumerate(zip(*children)):
+            if len({element_hash(kid) for kid in kids}) == 1:
+                self.chrome.append(path + [index])
+                found = True
+            elif self.walk(list(kids), path + [index], inner):
+                found = True
+        content.extend(inner if found else [path])
+        return found
+
+    def region_strainer(self, soups, content):
+        """
+        region_strainer(soups, content) returns a SoupStrainer that builds only the content
+            regions at the paths in content and the chrome regions, or None if they cannot
+            all be addressed that way. Sets `keys` to the id or tag name of each region.
+
+        region_strainer: (listof BeautifulSoup) (listof (listof int)) -> anyof(SoupStrainer, None)
+        """
+        regions = [find_path(soups[0], path) for path in content]
+        if not regions or None in regions or soups[0].body in regions:
+            return None
+        regions += self.chrome_elements
+        ids = [region.get('id') for region in regions]
+        if all(ids) and all(len(soup.find_all(id=key)) == 1 for soup in soups for key in ids):
+            by, keys, strainer = 'id', ids, SoupStrainer(id=ids)
+        else:
+            keys = [region.name for region in regions]
+            if not all(len(soup.find_all(name)) == 1 for soup in soups for name in keys):
+                return None
+            by, strainer = 'name', SoupStrainer(keys)
+        self.keys = {'content': keys[:len(content)], 'chrome': keys[len(content):], 'by': by}
+        return strainer
+
+    def find_region(self, soup, key):
+        """
+        find_region(soup, key) returns the only tag of soup with the id or tag name key, as
+            used in `keys`, or None if there is not exactly one.
+
+        find_region: BeautifulSoup Str -> anyof(Tag, None)
+        """
+        found = soup.find_all(id=key) if self.keys['by'] == 'id' else soup.find_all(key)
+        return found[0] if len(found) == 1 else None
+
+    def content_soup(self, content):
+        """
+        content_soup(content) returns a soup of the non-chrome part of the page content, or
+            of the whole page if its chrome differs from the learned template.
+
+        content_soup: Bytes -> BeautifulSoup
+        """
+        if self.learned and self.strainer is not None:
+            soup = BeautifulSoup(content, 'html.parser', parse_only=self.strainer)
+            regions = [self.find_region(soup, key) for key in self.keys['chrome']]
+            if all(self.find_region(soup, key) is not None for key in self.keys['content']) and \
+                    all(region is not None and element_hash(region) == chrome_hash
+                        for region, chrome_hash in zip(regions, self.chrome_hashes)):
+                for region in regions:
+                    region.decompose()
+                return soup
+        soup = BeautifulSoup(content, 'html.parser')
+        if self.learned:
+            regions = [find_path(soup, path) for path in self.chrome]
+            if all(region is not None and element_hash(region) == chrome_hash
+                   for region, chrome_hash in zip(regions, self.chrome_hashes)):
+                for region in regions:
+                    region.decompose()
+        return soup